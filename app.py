@@ -1,116 +1,199 @@
-import os, uuid, traceback, platform, string
+import json, os, platform, string
+from collections import namedtuple
 from pathlib import Path
-from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 import logging
-from logging.handlers import RotatingFileHandler
 
 from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file, abort
-from models import db, Album, Photo
-from exif_utils import extract_exif_data
+from sqlalchemy import event
+from models import db, Album, Photo, Task
+from scanner import sync_album
+from thumbs import ThumbnailCache
+from query_audit import audit_query_plans
+from keyset import neighbour_ids, album_page, album_list, album_days, album_count, encode_cursor, decode_cursor
+from cache import AppCache
+from tasks import TaskManager, album_key
+from search import ensure_search_index, search_photos
+from geo import rebuild_geo_cells, delete_geo_cells, backfill_geo, clusters
+from dupes import MAX_DISTANCE, find_duplicates, describe_clusters
+from sqlite_tuning import engine_options, setup_engines
+from metrics import RequestMetrics, setup_logging
+from watcher import AlbumWatcher
 from config import Config
 
+AlbumRef = namedtuple('AlbumRef', 'id name created_at cover_id')
+
+SCHEMA_COLUMNS = [
+    ('albums', 'thumbnail_photo_id', 'INTEGER'),
+    ('photos', 'file_size', 'INTEGER'),
+    ('photos', 'file_mtime', 'FLOAT'),
+    ('photos', 'file_inode', 'INTEGER'),
+    ('photos', 'geo_x', 'INTEGER'),
+    ('photos', 'geo_y', 'INTEGER'),
+    ('photos', 'content_hash', 'VARCHAR(32)'),
+    ('photos', 'phash', 'BIGINT'),
+    ('photos', 'hash_mtime', 'FLOAT'),
+]
+
 def ensure_schema():
+    # Errors propagate: starting on a half-migrated database would fail later in confusing ways
     from sqlalchemy import text
-    try:
-        conn = db.engine.connect()
-        cols = [r[1] for r in conn.execute(text('PRAGMA table_info(albums)')).fetchall()]
-        if 'thumbnail_photo_id' not in cols:
-            conn.execute(text('ALTER TABLE albums ADD COLUMN thumbnail_photo_id INTEGER'))
-            conn.commit()
-        conn.close()
-    except Exception:
-        pass
+    with db.engine.begin() as conn:
+        for table, column, ddl in SCHEMA_COLUMNS:
+            cols = [r[1] for r in conn.execute(text(f'PRAGMA table_info({table})')).fetchall()]
+            if column not in cols: conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        # Rows hashed before hash_mtime existed were hashed at their current mtime
+        conn.execute(text('UPDATE photos SET hash_mtime = file_mtime WHERE hash_mtime IS NULL AND content_hash IS NOT NULL'))
+        for index in Photo.__table__.indexes: index.create(bind=conn, checkfirst=True)
 
 def create_app():
     app = Flask(__name__, instance_relative_config=True, static_folder='static', template_folder='templates')
     app.config.from_object(Config)
     os.makedirs(app.instance_path, exist_ok=True)
 
-    # Logging
+    # Logging: files are written by a background listener; app.logger propagates to it through the root logger
     logs_dir = Path(app.instance_path) / 'logs'
     logs_dir.mkdir(parents=True, exist_ok=True)
-    file_all = RotatingFileHandler(str(logs_dir / 'app.log'), maxBytes=5*1024*1024, backupCount=3, encoding='utf-8')
-    file_err = RotatingFileHandler(str(logs_dir / 'error.log'), maxBytes=2*1024*1024, backupCount=5, encoding='utf-8')
-    fmt = logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s')
-    file_all.setFormatter(fmt); file_err.setFormatter(fmt)
-    file_all.setLevel(logging.DEBUG); file_err.setLevel(logging.ERROR)
-    app.logger.setLevel(logging.INFO); app.logger.addHandler(file_all); app.logger.addHandler(file_err)
-    root = logging.getLogger()
-    if not any(isinstance(h, RotatingFileHandler) for h in root.handlers):
-        root.setLevel(logging.INFO); root.addHandler(file_all); root.addHandler(file_err)
+    setup_logging(logs_dir)
+    app.logger.setLevel(logging.INFO)
+    app.metrics = RequestMetrics(app.config['METRICS_SLOW_MS'], app.config['METRICS_PROFILE'], app.config['METRICS_PROFILE_INTERVAL_MS'], app.logger)
 
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
     db.init_app(app)
     with app.app_context():
+        app.writer_session = setup_engines(db.engine, app.config)
+        event.listen(db.engine, 'before_cursor_execute', app.metrics.before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', app.metrics.after_cursor_execute)
         db.create_all(); ensure_schema()
+        with db.engine.connect() as conn: app.search_fts = ensure_search_index(conn)
+        if not app.search_fts: app.logger.warning('SQLite was built without FTS5: search falls back to LIKE')
+        backfill_geo()
+
+    app.task_manager = TaskManager(app, app.config['TASK_WORKERS'], app.config['TASK_KEEP_FINISHED'], app.config['TASK_RETENTION_HOURS'])
+    with app.app_context(): app.task_manager.recover()
+    app.cache = AppCache()
+    app.thumbs = ThumbnailCache(Path(app.instance_path) / 'thumbs', app.config['THUMB_SIZES'], app.config['THUMB_CACHE_MAX_BYTES'], app.config['THUMB_QUALITY'])
+    app.thumb_executor = ThreadPoolExecutor(max_workers=app.config['THUMB_WORKERS'])
 
-    app.task_executor = ThreadPoolExecutor(max_workers=2); app.tasks = {}
+    @app.cli.command('audit-queries')
+    def audit_queries():
+        import sys
+        problems = audit_query_plans()
+        print(json.dumps(problems, indent=2) if problems else 'All hot queries use their indexes.')
+        if problems: sys.exit(1)
 
     @app.before_request
     def before_request():
-        try: app.logger.info(f'REQ {request.method} {request.path}')
-        except Exception: pass
+        app.metrics.begin()
+        # Started with the first request rather than in create_app: CLI commands and the reloader's parent process never serve
+        if app.watcher is not None and app.watcher.thread is None: app.watcher.start()
 
     @app.after_request
     def after_request(response):
-        try: app.logger.info(f'RES {response.status_code} {request.method} {request.path}')
+        try:
+            label = f'{request.method} {request.url_rule.rule}' if request.url_rule else f'{request.method} <unmatched>'
+            timing = app.metrics.end(label, response.status_code, response.content_length)
+            if timing: app.logger.info(f'RES {response.status_code} {request.method} {request.path} {timing[0]:.1f}ms queries={timing[1]} bytes={response.content_length or 0}')
         except Exception: pass
         return response
 
+    def cached_albums(): return app.cache.get('albums', lambda: [AlbumRef(*r) for r in album_list()])
+
+    def cached_days(album_id): return app.cache.get(('days', album_id), lambda: album_days(album_id))
+
+    def cached_count(album_id): return app.cache.get(('count', album_id), lambda: album_count(album_id))
+
     @app.context_processor
     def inject_sidebar():
         try:
-            albums = Album.query.filter_by(archived=False).order_by(Album.name.asc()).all()
+            albums = sorted(cached_albums(), key=lambda a: a.name)
             album_id = None
             if request.view_args:
                 if 'album_id' in request.view_args: album_id = int(request.view_args.get('album_id'))
                 elif 'photo_id' in request.view_args:
-                    pid = request.view_args.get('photo_id'); p = Photo.query.get(int(pid)) if pid is not None else None
+                    pid = request.view_args.get('photo_id'); p = db.session.get(Photo, int(pid)) if pid is not None else None
                     album_id = p.album_id if p else None
             sidebar_days = []; current_album = None
             if album_id:
-                current_album = Album.query.get(album_id)
-                rows = db.session.query(Photo.day_label).filter(Photo.album_id==album_id, Photo.day_label.isnot(None)).distinct().order_by(Photo.day_label).all()
-                sidebar_days = [r[0] for r in rows]
+                current_album = db.session.get(Album, album_id)
+                sidebar_days = cached_days(album_id)
             return dict(sidebar_albums=albums, sidebar_days=sidebar_days, sidebar_current_album=current_album)
         except Exception:
             return dict(sidebar_albums=[], sidebar_days=[], sidebar_current_album=None)
 
-    def is_allowed_image(path: Path) -> bool:
-        return path.suffix in app.config['ALLOWED_EXTENSIONS']
-
-    def add_photo_record(album: Album, img_path: Path, day_label=None):
-        created_at, lat, lon = extract_exif_data(str(img_path))
-        if created_at is None:
-            try: created_at = datetime.fromtimestamp(img_path.stat().st_mtime)
-            except Exception: created_at = None
-        filename = img_path.name; user_title = os.path.splitext(filename)[0]
-        photo = Photo(album_id=album.id, file_path=str(img_path.resolve()), filename=filename, day_label=day_label, user_title=user_title, created_at=created_at, gps_lat=lat, gps_lon=lon)
-        db.session.add(photo); db.session.commit(); return 1
-
-    def scan_album_dir(album_path: Path, album: Album):
-        count = 0
-        for img in sorted(album_path.glob('*')):
-            if img.is_file() and is_allowed_image(img): count += add_photo_record(album, img, day_label=None)
-        for sub in sorted([p for p in album_path.rglob('*') if p.is_dir()]):
-            rel = sub.relative_to(album_path).as_posix()
-            for img in sorted(sub.glob('*')):
-                if img.is_file() and is_allowed_image(img): count += add_photo_record(album, img, day_label=rel)
-        return count
+    def album_for(album_path: Path):
+        # Albums are identified by folder name: /2023/Trip and /2024/Trip are the same album, so scans of either share its task key
+        from sqlalchemy.exc import IntegrityError
+        album = Album.query.filter_by(name=album_path.name).first()
+        if album is None:
+            album = Album(name=album_path.name, path=str(album_path.resolve())); db.session.add(album)
+            try: db.session.commit()
+            except IntegrityError: db.session.rollback(); album = Album.query.filter_by(name=album_path.name).one()
+        return album
+
+    def import_album(album_id, album_path: Path, progress=None):
+        album = db.session.get(Album, album_id)
+        if album is None: raise ValueError(f'Album {album_id} no longer exists')
+        album.path = str(album_path.resolve()); album.archived = False; db.session.commit()
+        return scan_album(album, album_path, progress)
+
+    def resync_album(album_id, progress=None, dirs=None):
+        # Watcher syncs go by id: the album may have been renamed since its folder was added.
+        # dirs: the (folder, recursive) pairs the watcher saw change, None for the whole album
+        album = db.session.get(Album, album_id)
+        if album is None: raise ValueError(f'Album {album_id} no longer exists')
+        return scan_album(album, Path(album.path), progress, dirs)
+
+    def scan_album(album, album_path, progress=None, dirs=None):
+        # Long scan writes go through the dedicated writer connection; page loads keep using db.session
+        stats = changes = None
+        try:
+            with app.writer_session() as session:
+                stats, changes = sync_album(album, album_path, app.config['ALLOWED_EXTENSIONS'], workers=app.config['SCAN_WORKERS'],
+                                            batch_size=app.config['SCAN_BATCH_SIZE'], use_processes=app.config['SCAN_USE_PROCESSES'],
+                                            progress=progress, session=session, dirs=dirs)
+        finally:
+            # Derived data is refreshed for what the sync wrote. After a cancelled or failed scan the batches
+            # it committed are kept and must show up, but which rows they touched is unknown: refresh the album.
+            if changes is None or changes.geo:
+                with app.writer_session() as session: rebuild_geo_cells(album.id, session)
+            if album.thumbnail_photo_id is None:
+                first = Photo.query.filter_by(album_id=album.id).order_by(Photo.created_at.asc(), Photo.id.asc()).first()
+                if first: album.thumbnail_photo_id = first.id; db.session.commit()
+            if app.config['THUMB_PREWARM'] and (changes is None or changes.photo_ids):
+                cols = (Photo.id, Photo.file_path, Photo.file_mtime)
+                if changes is None:
+                    items = db.session.query(*cols).filter(Photo.album_id==album.id).order_by(Photo.created_at.asc(), Photo.id.asc()).all()
+                else:
+                    ids = changes.photo_ids; items = []
+                    for i in range(0, len(ids), 500): items += db.session.query(*cols, Photo.created_at).filter(Photo.id.in_(ids[i:i+500])).all()
+                    items.sort(key=lambda r: (r.created_at is not None, r.created_at or 0, r.id))
+                app.thumb_executor.submit(app.thumbs.warm, [tuple(r)[:3] for r in items], [app.config['THUMB_GRID_WIDTH']])
+            app.cache.invalidate_album(album.id)
+            if app.watcher is not None: app.watcher.refresh()
+        return album, stats
+
+    app.watcher = None
+    if app.config['WATCH_ALBUMS']:
+        app.watcher = AlbumWatcher(app, resync_album, app.config['WATCH_MODE'], app.config['WATCH_DEBOUNCE_SECONDS'],
+                                   app.config['WATCH_MAX_DELAY_SECONDS'], app.config['WATCH_POLL_SECONDS'])
+
+    def photo_page(album_id, cursor, limit, day_label=None):
+        cols = (Photo.id, Photo.day_label, Photo.created_at, Photo.user_title, Photo.filename)
+        rows = album_page(album_id, cursor, limit, cols, day_label); grouped = []
+        for p in rows:
+            key = p.day_label or (p.created_at.date().isoformat() if p.created_at else 'Unknown')
+            if grouped and grouped[-1][0] == key: grouped[-1][1].append(p)
+            else: grouped.append((key, [p]))
+        return grouped, encode_cursor(rows[-1]) if len(rows) == limit else None
 
     @app.route('/')
     def index(): return redirect(url_for('albums'))
 
     @app.get('/albums')
     def albums():
-        all_albums = Album.query.filter_by(archived=False).order_by(Album.created_at.desc()).all()
-        covers = {}
-        for a in all_albums:
-            pid = a.thumbnail_photo_id
-            if pid is None:
-                first = Photo.query.filter_by(album_id=a.id).order_by(Photo.created_at.asc(), Photo.id.asc()).first()
-                pid = first.id if first else None
-            covers[a.id] = pid
+        all_albums = cached_albums()
+        covers = {a.id: a.cover_id for a in all_albums}
         return render_template('albums.html', albums=all_albums, covers=covers)
 
     @app.post('/api/albums/add')
@@ -121,16 +204,12 @@ def create_app():
         p = Path(path)
         if not p.exists() or not p.is_dir(): return jsonify({'error':'Directory not found'}), 404
         app.logger.info(f'Add album sync path={path}')
-        album_name = p.name
-        album = Album.query.filter_by(name=album_name).first()
-        if album: album.path = str(p.resolve()); album.archived=False; db.session.commit()
-        else: album = Album(name=album_name, path=str(p.resolve())); db.session.add(album); db.session.commit()
-        Photo.query.filter_by(album_id=album.id).delete(); db.session.commit()
-        cnt = scan_album_dir(p, album)
-        if album.thumbnail_photo_id is None:
-            first = Photo.query.filter_by(album_id=album.id).order_by(Photo.created_at.asc(), Photo.id.asc()).first()
-            if first: album.thumbnail_photo_id = first.id; db.session.commit()
-        return jsonify({'status':'ok','album_id':album.id,'album_name':album.name,'photos_scanned':cnt})
+        album_id = album_for(p).id
+        task_id, created = app.task_manager.run(album_key(album_id), p, lambda path, progress: import_album(album_id, path, progress))
+        if not created: return jsonify({'error':'A scan of this album is already running','task_id':task_id}), 409
+        task = db.session.get(Task, task_id)
+        if task.state != 'done': return jsonify({'error':task.message or task.state,'task_id':task_id}), 409 if task.state == 'cancelled' else 500
+        return jsonify({'status':'ok','album_id':task.album_id,'album_name':task.album_name,'task_id':task_id,**json.loads(task.result)})
 
     @app.post('/api/albums/add_async')
     def api_albums_add_async():
@@ -139,32 +218,29 @@ def create_app():
         if not path: return jsonify({'error':'Path is required'}), 400
         p = Path(path)
         if not p.exists() or not p.is_dir(): return jsonify({'error':'Directory not found'}), 404
-        task_id = str(uuid.uuid4()); app.tasks[task_id] = {'state':'pending'}
-        def run_task(album_path: Path):
-            with app.app_context():
-                try:
-                    app.logger.info(f'Scan task started path={album_path}')
-                    album_name = album_path.name
-                    album = Album.query.filter_by(name=album_name).first()
-                    if album: album.path = str(album_path.resolve()); album.archived=False; db.session.commit()
-                    else: album = Album(name=album_name, path=str(album_path.resolve())); db.session.add(album); db.session.commit()
-                    Photo.query.filter_by(album_id=album.id).delete(); db.session.commit()
-                    cnt = scan_album_dir(album_path, album)
-                    if album.thumbnail_photo_id is None:
-                        first = Photo.query.filter_by(album_id=album.id).order_by(Photo.created_at.asc(), Photo.id.asc()).first()
-                        if first: album.thumbnail_photo_id = first.id; db.session.commit()
-                    app.logger.info(f'Scan task done album_id={album.id} photos={cnt}')
-                    app.tasks[task_id] = {'state':'done','album_id':album.id,'album_name':album.name,'photos_scanned':cnt}
-                except Exception as e:
-                    app.logger.error('Scan task failed', exc_info=True)
-                    app.tasks[task_id] = {'state':'error','message':str(e),'trace': traceback.format_exc()}
-        app.task_executor.submit(run_task, p); return jsonify({'task_id': task_id})
+        album_id = album_for(p).id
+        task_id, created = app.task_manager.submit(album_key(album_id), p, lambda path, progress: import_album(album_id, path, progress))
+        if not created: app.logger.info(f'Scan already queued path={path} task_id={task_id}')
+        return jsonify({'task_id': task_id, 'deduplicated': not created})
+
+    @app.get('/api/tasks')
+    def api_tasks():
+        tasks = Task.query.order_by(Task.created_at.desc()).limit(50).all()
+        return jsonify({'tasks':[app.task_manager.status(t) for t in tasks]})
 
     @app.get('/api/tasks/<task_id>')
     def api_task_status(task_id):
-        info = app.tasks.get(task_id)
-        if not info: return jsonify({'error':'unknown task'}), 404
-        return jsonify(info)
+        task = db.session.get(Task, task_id)
+        if not task: return jsonify({'error':'unknown task'}), 404
+        return jsonify(app.task_manager.status(task))
+
+    @app.post('/api/tasks/<task_id>/cancel')
+    def api_task_cancel(task_id):
+        task = db.session.get(Task, task_id)
+        if not task: return jsonify({'error':'unknown task'}), 404
+        if not app.task_manager.cancel(task_id): return jsonify({'error':'Task is not running','state':task.state}), 409
+        app.logger.info(f'Cancel requested task_id={task_id}')
+        return jsonify({'status':'ok','task_id':task_id})
 
     @app.post('/api/albums/<int:album_id>/remove')
     def api_albums_remove(album_id):
@@ -172,9 +248,12 @@ def create_app():
         mode = (data.get('mode') or 'archive').lower()
         app.logger.info(f'Remove album id={album_id} mode={mode}')
         album = Album.query.get_or_404(album_id)
-        if mode == 'archive': album.archived=True; db.session.commit(); return jsonify({'status':'ok','archived':True})
-        elif mode == 'delete': Photo.query.filter_by(album_id=album.id).delete(); db.session.delete(album); db.session.commit(); return jsonify({'status':'ok','deleted':True})
+        if mode == 'archive': album.archived=True; db.session.commit(); result = {'status':'ok','archived':True}
+        elif mode == 'delete': Photo.query.filter_by(album_id=album.id).delete(); db.session.delete(album); db.session.commit(); delete_geo_cells(album_id); result = {'status':'ok','deleted':True}
         else: return jsonify({'error':'Invalid mode. Use \'archive\' or \'delete\'.'}), 400
+        app.cache.invalidate_album(album_id)
+        if app.watcher is not None: app.watcher.refresh()
+        return jsonify(result)
 
     @app.patch('/api/albums/<int:album_id>/rename')
     def api_album_rename(album_id):
@@ -184,7 +263,7 @@ def create_app():
         new_name = (data.get('name') or '').strip()
         if not new_name: app.logger.error('Rename failed: empty name'); return jsonify({'error':'Name required'}), 400
         old = album.name; album.name = new_name
-        try: db.session.commit(); app.logger.info(f"Album renamed id={album.id} '{old}' -> '{new_name}'")
+        try: db.session.commit(); app.cache.invalidate('albums'); app.logger.info(f"Album renamed id={album.id} '{old}' -> '{new_name}'")
         except IntegrityError: db.session.rollback(); app.logger.error(f"Rename conflict for id={album.id} name='{new_name}'", exc_info=True); return jsonify({'error':'Album name already exists'}), 409
         except Exception: db.session.rollback(); app.logger.error('Rename failed (unexpected)', exc_info=True); return jsonify({'error':'Rename failed'}), 500
         return jsonify({'status':'ok','album_id':album.id,'name':album.name})
@@ -197,7 +276,7 @@ def create_app():
         new_name = (data.get('name') or '').strip()
         if not new_name: app.logger.error('Rename failed: empty name'); return jsonify({'error':'Name required'}), 400
         old = album.name; album.name = new_name
-        try: db.session.commit(); app.logger.info(f"Album renamed id={album.id} '{old}' -> '{new_name}'")
+        try: db.session.commit(); app.cache.invalidate('albums'); app.logger.info(f"Album renamed id={album.id} '{old}' -> '{new_name}'")
         except IntegrityError: db.session.rollback(); app.logger.error(f"Rename conflict for id={album.id} name='{new_name}'", exc_info=True); return jsonify({'error':'Album name already exists'}), 409
         except Exception: db.session.rollback(); app.logger.error('Rename failed (unexpected)', exc_info=True); return jsonify({'error':'Rename failed'}), 500
         return jsonify({'status':'ok','album_id':album.id,'name':album.name})
@@ -210,60 +289,81 @@ def create_app():
         if not photo_id: return jsonify({'error':'photo_id required'}), 400
         photo = Photo.query.get_or_404(int(photo_id))
         if photo.album_id != album.id: return jsonify({'error':'Photo does not belong to this album'}), 400
-        album.thumbnail_photo_id = photo.id; db.session.commit(); return jsonify({'status':'ok','thumbnail_photo_id':album.thumbnail_photo_id})
+        album.thumbnail_photo_id = photo.id; db.session.commit(); app.cache.invalidate('albums'); return jsonify({'status':'ok','thumbnail_photo_id':album.thumbnail_photo_id})
 
     @app.get('/api/albums/<int:album_id>/meta')
     def api_album_meta(album_id):
         album = Album.query.get_or_404(album_id)
         app.logger.info(f'Meta for album id={album.id}')
-        photo_count = Photo.query.filter_by(album_id=album.id).count()
+        photo_count = cached_count(album.id)
         return jsonify({'id':album.id,'name':album.name,'created_at': album.created_at.isoformat() if album.created_at else None,'photo_count':photo_count,'path':album.path})
 
     @app.get('/albums/<int:album_id>')
     def album_home(album_id):
         app.logger.info(f'Album home id={album_id}')
         album = Album.query.get_or_404(album_id)
-        days = db.session.query(Photo.day_label).filter(Photo.album_id==album.id).distinct().order_by(Photo.day_label).all()
-        day_labels = [d[0] for d in days if d[0]]
-        photo_count = Photo.query.filter_by(album_id=album.id).count()
+        day_labels = cached_days(album.id)
+        photo_count = cached_count(album.id)
         return render_template('album.html', album=album, day_labels=day_labels, photo_count=photo_count)
 
     @app.get('/albums/<int:album_id>/all')
     def album_all(album_id):
         album = Album.query.get_or_404(album_id)
-        photos = Photo.query.filter_by(album_id=album.id).order_by(Photo.created_at.asc(), Photo.id.asc()).all()
-        groups = {}
-        for p in photos:
-            key = p.day_label or (p.created_at.date().isoformat() if p.created_at else 'Unknown')
-            groups.setdefault(key, []).append(p)
-        grouped = sorted(groups.items(), key=lambda kv: kv[0])
-        return render_template('grid.html', album=album, grouped=grouped, mode='all')
+        grouped, next_cursor = photo_page(album.id, None, app.config['PHOTO_PAGE_SIZE'])
+        return render_template('grid.html', album=album, grouped=grouped, next_cursor=next_cursor, mode='all', day_label=None)
 
     @app.get('/albums/<int:album_id>/day/<path:day_label>')
     def album_day(album_id, day_label):
         album = Album.query.get_or_404(album_id)
-        photos = Photo.query.filter_by(album_id=album.id, day_label=day_label).order_by(Photo.created_at.asc(), Photo.id.asc()).all()
-        grouped = [(day_label, photos)]
-        return render_template('grid.html', album=album, grouped=grouped, mode='day')
+        grouped, next_cursor = photo_page(album.id, None, app.config['PHOTO_PAGE_SIZE'], day_label)
+        return render_template('grid.html', album=album, grouped=grouped or [(day_label, [])], next_cursor=next_cursor, mode='day', day_label=day_label)
+
+    @app.get('/api/albums/<int:album_id>/photos')
+    def api_album_photos(album_id):
+        album = Album.query.get_or_404(album_id)
+        try: cursor = decode_cursor(request.args.get('cursor'))
+        except ValueError as e: return jsonify({'error':str(e)}), 400
+        limit = max(1, min(request.args.get('limit', app.config['PHOTO_PAGE_SIZE'], type=int), 1000))
+        grouped, next_cursor = photo_page(album.id, cursor, limit, request.args.get('day') or None)
+        photos = [{'id':p.id,'group':group,'title':p.user_title or p.filename} for group, rows in grouped for p in rows]
+        return jsonify({'album_id':album.id,'photos':photos,'next_cursor':next_cursor})
 
     @app.get('/photos/<int:photo_id>')
     def photo_view(photo_id):
         photo = Photo.query.get_or_404(photo_id); album = photo.album
         context = request.args.get('context', 'all')
         day = context.split(':',1)[1] if context.startswith('day:') else None
-        q = Photo.query.filter_by(album_id=album.id)
-        if day: q = q.filter_by(day_label=day)
-        photos = q.order_by(Photo.created_at.asc(), Photo.id.asc()).all()
-        ids = [p.id for p in photos]; idx = ids.index(photo.id) if photo.id in ids else 0
-        prev_id = ids[idx-1] if idx>0 else None; next_id = ids[idx+1] if idx < len(ids)-1 else None
+        prev_ids, next_ids = neighbour_ids(photo, day)
+        prev_id = prev_ids[0] if prev_ids else None; next_id = next_ids[0] if next_ids else None
         return render_template('photo.html', album=album, photo=photo, prev_id=prev_id, next_id=next_id, context=context)
 
+    @app.get('/api/photos/<int:photo_id>/neighbours')
+    def api_photo_neighbours(photo_id):
+        photo = Photo.query.get_or_404(photo_id)
+        context = request.args.get('context', 'all')
+        day = context.split(':',1)[1] if context.startswith('day:') else None
+        n = max(1, min(request.args.get('n', 5, type=int), 50))
+        prev_ids, next_ids = neighbour_ids(photo, day, n)
+        return jsonify({'id':photo.id,'context':context,'prev':prev_ids,'next':next_ids})
+
     @app.get('/photo/raw/<int:photo_id>')
     def photo_raw(photo_id):
         photo = Photo.query.get_or_404(photo_id); path = Path(photo.file_path)
         if not path.exists(): abort(404)
         return send_file(str(path), as_attachment=False, download_name=photo.filename)
 
+    @app.get('/photo/thumb/<int:photo_id>')
+    def photo_thumb(photo_id):
+        photo = Photo.query.get_or_404(photo_id); path = Path(photo.file_path)
+        try: mtime = path.stat().st_mtime
+        except OSError: abort(404)
+        width = app.thumbs.snap_width(request.args.get('w', app.config['THUMB_GRID_WIDTH']))
+        try: out = app.thumbs.get(photo.id, str(path), mtime, width)
+        except Exception:
+            app.logger.error(f'Thumbnail failed id={photo.id} w={width}', exc_info=True)
+            return send_file(str(path), as_attachment=False, download_name=photo.filename)
+        return send_file(str(out), mimetype='image/jpeg', conditional=True, max_age=3600)
+
     @app.patch('/api/photos/<int:photo_id>')
     def api_update_photo(photo_id):
         app.logger.info(f'Update photo id={photo_id} fields={list((request.get_json(silent=True) or {}).keys())}')
@@ -272,6 +372,64 @@ def create_app():
         if 'user_description' in data: photo.user_description = data['user_description'] or None
         db.session.commit(); return jsonify({'status':'ok'})
 
+    def run_search():
+        q = (request.args.get('q') or '').strip()
+        limit = max(1, min(request.args.get('limit', 50, type=int), 200)); offset = max(0, request.args.get('offset', 0, type=int))
+        album_id = request.args.get('album_id', type=int)
+        rows = search_photos(q, limit + 1, offset, album_id, app.search_fts) if q else []
+        next_offset = offset + limit if len(rows) > limit else None
+        return q, [dict(r) for r in rows[:limit]], next_offset
+
+    @app.get('/api/search')
+    def api_search():
+        q, results, next_offset = run_search()
+        if not q: return jsonify({'error':'q is required'}), 400
+        return jsonify({'query':q,'results':results,'next_offset':next_offset})
+
+    @app.get('/search')
+    def search_page():
+        q, results, next_offset = run_search()
+        return render_template('search.html', q=q, results=results, next_offset=next_offset)
+
+    @app.get('/api/duplicates')
+    def api_duplicates():
+        distance = max(0, min(request.args.get('distance', app.config['DUPLICATE_DISTANCE'], type=int), MAX_DISTANCE))
+        limit = max(1, min(request.args.get('limit', 100, type=int), 500)); offset = max(0, request.args.get('offset', 0, type=int))
+        album_id = request.args.get('album_id', type=int)
+        # Clustering reads every hash in scope: compute once per (distance, album) and page through the cached list
+        found = app.cache.get(('duplicates', distance, album_id), lambda: find_duplicates(distance, album_id))
+        items = describe_clusters(found[offset:offset + limit])
+        for c in items:
+            for p in c['photos']: p['thumb'] = url_for('photo_thumb', photo_id=p['id'], w=app.config['THUMB_GRID_WIDTH'])
+        next_offset = offset + limit if len(found) > offset + limit else None
+        return jsonify({'distance':distance,'total_clusters':len(found),'duplicate_photos':sum(len(c) for c in found),
+                        'clusters':items,'next_offset':next_offset})
+
+    @app.get('/api/metrics')
+    def api_metrics():
+        return jsonify(app.metrics.snapshot())
+
+    @app.post('/api/metrics/reset')
+    def api_metrics_reset():
+        app.metrics.reset(); return jsonify({'status':'ok'})
+
+    @app.get('/api/map/clusters')
+    def api_map_clusters():
+        bbox = request.args.get('bbox', '-180,-85,180,85')
+        try: zoom, items = clusters(bbox, request.args.get('zoom', 2, type=int), request.args.get('album_id', type=int))
+        except ValueError: return jsonify({'error':'bbox must be west,south,east,north'}), 400
+        for c in items: c['thumb'] = url_for('photo_thumb', photo_id=c['photo_id'], w=200)
+        return jsonify({'zoom':zoom,'clusters':items,'total':sum(c['count'] for c in items)})
+
+    @app.get('/map')
+    def map_view():
+        return render_template('map.html', album=None)
+
+    @app.get('/albums/<int:album_id>/map')
+    def album_map(album_id):
+        album = Album.query.get_or_404(album_id)
+        return render_template('map.html', album=album)
+
     @app.get('/api/fs/list')
     def api_fs_list():
         sep = os.sep; start = Path.home()
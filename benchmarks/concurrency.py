@@ -0,0 +1,84 @@
+"""Page latency while a large scan is writing, with and without the SQLite tuning layer.
+
+    python benchmarks/concurrency.py --days 20 --per-day 500
+    python benchmarks/concurrency.py --no-tuning          # driver defaults, for comparison
+    python benchmarks/concurrency.py --max-p95-ms 250     # exit non-zero above this bound
+    python benchmarks/concurrency.py --imports 1          # a single import instead of two at once
+
+Imports a small album, measures page loads from several reader threads while idle, then again
+while background tasks scan large synthetic albums (two at once by default, so the scans also
+share the writer connection), and reports p50/p95/max latency and failed requests (e.g.
+"database is locked") for both phases as JSON. Fails if any of the scans does not finish.
+"""
+import argparse, json, os, shutil, sys, tempfile, threading, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from synth import generate_album
+from suite import percentile
+
+def read_load(client, urls, stop, samples, errors):
+    i = 0
+    while not stop.is_set():
+        url = urls[i % len(urls)]; i += 1; t0 = time.perf_counter()
+        try: status = client.get(url).status_code
+        except Exception: status = None
+        samples.append((time.perf_counter() - t0) * 1000)
+        if status != 200: errors.append(f'{url} -> {status}')
+
+def measure(client, urls, readers, until):
+    stop, samples, errors = threading.Event(), [], []
+    threads = [threading.Thread(target=read_load, args=(client, urls, stop, samples, errors)) for _ in range(readers)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    until(); stop.set()
+    for t in threads: t.join()
+    dt = time.perf_counter() - t0
+    return {'seconds': round(dt, 2), 'requests': len(samples), 'req_per_s': round(len(samples) / dt, 1),
+            'p50_ms': round(percentile(samples, 50), 2), 'p95_ms': round(percentile(samples, 95), 2),
+            'max_ms': round(max(samples), 2), 'errors': len(errors), 'first_error': errors[0] if errors else None}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--days', type=int, default=20); ap.add_argument('--per-day', type=int, default=250)
+    ap.add_argument('--imports', type=int, default=2, help='albums imported concurrently (days x per-day photos each)')
+    ap.add_argument('--readers', type=int, default=4); ap.add_argument('--idle-seconds', type=float, default=3)
+    ap.add_argument('--no-tuning', action='store_true', help='run with SQLITE_TUNING=0')
+    ap.add_argument('--max-p95-ms', type=float, help='fail if the p95 page latency during the scan exceeds this')
+    ap.add_argument('--keep', action='store_true', help='keep the temporary libraries and database')
+    args = ap.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='album-concurrency-'))
+    generate_album(str(work / 'Browse'), days=2, per_day=100, size=(320, 240))
+    imports = [work / f'Import{n}' for n in range(1, max(1, args.imports) + 1)]
+    photos = sum(generate_album(str(path), args.days, args.per_day, size=(320, 240), seed=n) for n, path in enumerate(imports, 1))
+
+    # Config reads the environment at import time
+    os.environ['DATABASE_URL'] = f'sqlite:///{work / "bench.db"}'; os.environ['THUMB_PREWARM'] = '0'
+    os.environ['SQLITE_TUNING'] = '0' if args.no_tuning else '1'
+    from app import create_app
+    app = create_app(); client = app.test_client()
+    album_id = client.post('/api/albums/add', json={'path': str(work / 'Browse')}).get_json()['album_id']
+    first = client.get(f'/api/albums/{album_id}/photos?limit=1').get_json()['photos'][0]['id']
+    urls = [f'/albums/{album_id}/all', f'/api/albums/{album_id}/photos?limit=50', f'/photos/{first}', f'/api/photos/{first}/neighbours',
+            '/api/search?q=IMG', '/api/map/clusters?zoom=3']
+
+    report = {'tuning': not args.no_tuning, 'readers': args.readers, 'imports': len(imports), 'import_photos': photos}
+    report['idle'] = measure(client, urls, args.readers, lambda: time.sleep(args.idle_seconds))
+    task_ids = [client.post('/api/albums/add_async', json={'path': str(path)}).get_json()['task_id'] for path in imports]
+    def wait_for_scans():
+        while any(client.get(f'/api/tasks/{t}').get_json()['state'] in ('pending', 'running') for t in task_ids): time.sleep(0.1)
+    report['during_scan'] = measure(client, urls, args.readers, wait_for_scans)
+    tasks = [client.get(f'/api/tasks/{t}').get_json() for t in task_ids]
+    report['scans'] = [{'state': task['state'], 'seconds': task.get('progress', {}).get('elapsed_seconds'),
+                        **{k: task[k] for k in ('added', 'updated', 'removed', 'message') if k in task}} for task in tasks]
+
+    print(json.dumps(report, indent=2))
+    if not args.keep: shutil.rmtree(work, ignore_errors=True)
+    failed = report['during_scan']['errors'] or any(task['state'] != 'done' for task in tasks)
+    if args.max_p95_ms is not None and report['during_scan']['p95_ms'] > args.max_p95_ms: failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Time the near-duplicate finder on synthetic perceptual hashes.
+
+    python benchmarks/dupes_bench.py --photos 100000 --distance 6
+
+Generates random 64-bit hashes plus a share of near copies (a few flipped bits) and a share of
+flat, low-detail pictures (hashes with only a few 0 or 1 bits, as solid frames or plain skies give),
+clusters them with the multi-index finder and, for small inputs, checks the result against a
+brute-force scan. Fails if any flat picture ends up in a cluster.
+"""
+import argparse, json, random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dupes import cluster_hashes, low_detail, popcount, MASK
+
+def flat_hash(rnd, distance):
+    # All 0s or all 1s with up to `distance` bits flipped: degenerate and low-variance images
+    h = 0 if rnd.random() < 0.5 else MASK
+    for b in rnd.sample(range(64), rnd.randint(0, distance)): h ^= 1 << b
+    return h
+
+def synth_hashes(photos, dup_ratio, distance, seed, flat_ratio=0.0):
+    rnd = random.Random(seed); items = []
+    for i in range(photos):
+        if rnd.random() < flat_ratio:
+            h = flat_hash(rnd, distance)
+        elif items and rnd.random() < dup_ratio:
+            h = rnd.choice(items)[1]
+            for b in rnd.sample(range(64), rnd.randint(0, distance)): h ^= 1 << b
+        else:
+            h = rnd.getrandbits(64)
+        items.append((i + 1, h))
+    return items
+
+def brute_force(items, distance):
+    items = [(i, h) for i, h in items if not low_detail(h, distance)]
+    parent = {i: i for i, _ in items}
+    def find(i):
+        while parent[i] != i: i = parent[i]
+        return i
+    for a in range(len(items)):
+        for b in range(a):
+            if popcount((items[a][1] ^ items[b][1]) & MASK) <= distance: parent[find(items[a][0])] = find(items[b][0])
+    groups = {}
+    for i, _ in items: groups.setdefault(find(i), []).append(i)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--photos', type=int, default=100000); ap.add_argument('--distance', type=int, default=6)
+    ap.add_argument('--dup-ratio', type=float, default=0.1, help='share of photos that are near copies of an earlier one')
+    ap.add_argument('--flat-ratio', type=float, default=0.05, help='share of photos with flat, low-detail hashes')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+
+    items = synth_hashes(args.photos, args.dup_ratio, args.distance, args.seed, args.flat_ratio)
+    t0 = time.perf_counter(); clusters = cluster_hashes(items, args.distance); dt = time.perf_counter() - t0
+    report = {'photos': args.photos, 'distance': args.distance, 'seconds': round(dt, 3), 'clusters': len(clusters),
+              'duplicate_photos': sum(len(c) for c in clusters), 'largest_cluster': max(map(len, clusters), default=0)}
+    flat = {i for i, h in items if low_detail(h, args.distance)}
+    report['flat_photos'] = len(flat); report['flat_photos_clustered'] = sum(1 for c in clusters for i in c if i in flat)
+    if args.photos <= 3000: report['matches_brute_force'] = clusters == brute_force(items, args.distance)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report['flat_photos_clustered'] or report.get('matches_brute_force') is False else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Compare the header-only EXIF reader against the Pillow path.
+
+    python benchmarks/exif_bench.py --corpus "D:\\Photos\\Japan 2024"
+    python benchmarks/exif_bench.py --generate 3000
+"""
+import argparse, json, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from exif_utils import extract_exif_data, extract_exif_data_pillow
+from config import Config
+from synth import generate_album
+
+def time_reader(fn, files, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in files: fn(p)
+        dt = time.perf_counter() - t0; best = dt if best is None else min(best, dt)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--corpus', help='folder with images (searched recursively)')
+    ap.add_argument('--generate', type=int, default=2000, help='synthetic JPEGs to create when no corpus is given')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    root = args.corpus or tempfile.mkdtemp(prefix='exif-bench-')
+    if not args.corpus: generate_album(root, days=max(1, args.generate // 100), per_day=min(args.generate, 100), size=(640, 480))
+    files = [str(p) for p in Path(root).rglob('*') if p.is_file() and p.suffix in Config.ALLOWED_EXTENSIONS]
+    if not files: sys.exit('no images found')
+
+    mismatches = sum(1 for p in files if extract_exif_data(p) != extract_exif_data_pillow(p))  # also warms the page cache
+    fast = time_reader(extract_exif_data, files, args.repeat)
+    pillow = time_reader(extract_exif_data_pillow, files, args.repeat)
+    print(json.dumps({'files': len(files), 'mismatches': mismatches,
+                      'header_only_us_per_file': round(fast / len(files) * 1e6, 1),
+                      'pillow_us_per_file': round(pillow / len(files) * 1e6, 1),
+                      'speedup': round(pillow / fast, 2) if fast else None}, indent=2))
+
+if __name__ == '__main__':
+    main()
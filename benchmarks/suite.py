@@ -0,0 +1,102 @@
+"""Scan and page-load benchmarks against a synthetic library, reported as JSON.
+
+    python benchmarks/suite.py --days 20 --per-day 100 --out bench.json
+
+Times a cold scan (first import) and a warm rescan (nothing changed), then loads the main
+routes through the Flask test client and reports p50/p95 latency, requests/s and SQL query
+counts per route, plus the peak RSS of the process.
+"""
+import argparse, json, os, platform, random, shutil, statistics, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from synth import generate_album
+
+def peak_rss_mb():
+    try: import resource
+    except ImportError: return None  # Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+class QueryCounter:
+    def __init__(self): self.count = 0
+    def __call__(self, *args): self.count += 1
+
+def time_route(client, counter, urls):
+    latencies, queries, size = [], [], 0
+    for url in urls:
+        counter.count = 0; t0 = time.perf_counter()
+        res = client.get(url); body = res.get_data()
+        latencies.append((time.perf_counter() - t0) * 1000); queries.append(counter.count); size += len(body)
+        if res.status_code != 200: raise RuntimeError(f'{url} -> {res.status_code}')
+    total = sum(latencies) / 1000
+    return {'requests': len(urls), 'p50_ms': round(percentile(latencies, 50), 2), 'p95_ms': round(percentile(latencies, 95), 2),
+            'req_per_s': round(len(urls) / total, 1) if total else None, 'queries_avg': round(statistics.mean(queries), 1),
+            'queries_max': max(queries), 'bytes_avg': size // len(urls)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--days', type=int, default=10); ap.add_argument('--per-day', type=int, default=100)
+    ap.add_argument('--width', type=int, default=1024); ap.add_argument('--height', type=int, default=768)
+    ap.add_argument('--samples', type=int, default=50, help='requests per route')
+    ap.add_argument('--library', help='reuse an existing synthetic album folder instead of generating one')
+    ap.add_argument('--out', help='write the JSON report here as well as to stdout')
+    ap.add_argument('--keep', action='store_true', help='keep the temporary library and database')
+    args = ap.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='album-bench-'))
+    album_dir = Path(args.library) if args.library else work / 'Bench Album'
+    t0 = time.perf_counter()
+    photos = len(list(album_dir.rglob('*.jpg'))) if args.library else generate_album(str(album_dir), args.days, args.per_day, (args.width, args.height))
+    gen_s = time.perf_counter() - t0
+
+    # Config reads the environment at import time
+    os.environ['DATABASE_URL'] = f'sqlite:///{work / "bench.db"}'; os.environ['THUMB_PREWARM'] = '0'
+    from app import create_app
+    from models import db, Photo
+    from sqlalchemy import event
+    app = create_app(); app.thumbs.root = work / 'thumbs'  # keep benchmark derivatives out of the real cache
+    client = app.test_client(); counter = QueryCounter()
+    with app.app_context(): event.listen(db.engine, 'before_cursor_execute', counter)
+
+    report = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'platform': platform.platform(), 'photos': photos, 'generate_s': round(gen_s, 2), 'scan': {}, 'routes': {}}
+    for name in ('cold', 'warm'):
+        counter.count = 0; t0 = time.perf_counter()
+        res = client.post('/api/albums/add', json={'path': str(album_dir)})
+        dt = time.perf_counter() - t0
+        if res.status_code != 200: raise RuntimeError(res.get_data(as_text=True))
+        report['scan'][name] = {'seconds': round(dt, 3), 'photos_per_s': round(photos / dt, 1), 'queries': counter.count,
+                                **{k: v for k, v in res.get_json().items() if k in ('added', 'updated', 'unchanged', 'removed')}}
+        album_id = res.get_json()['album_id']
+
+    with app.app_context():
+        ids = [r[0] for r in db.session.query(Photo.id).filter_by(album_id=album_id).all()]
+        day = db.session.query(Photo.day_label).filter_by(album_id=album_id).first()[0]
+    rnd = random.Random(0); sample = [rnd.choice(ids) for _ in range(args.samples)]
+    routes = {
+        'albums': ['/albums'] * args.samples,
+        'album_home': [f'/albums/{album_id}'] * args.samples,
+        'album_all': [f'/albums/{album_id}/all'] * args.samples,
+        'album_day': [f'/albums/{album_id}/day/{day}'] * args.samples,
+        'api_album_photos': [f'/api/albums/{album_id}/photos'] * args.samples,
+        'photo_view': [f'/photos/{i}' for i in sample],
+        'photo_raw': [f'/photo/raw/{i}' for i in sample],
+        'photo_thumb_cold': [f'/photo/thumb/{i}?w=400' for i in dict.fromkeys(sample)],
+        'photo_thumb_warm': [f'/photo/thumb/{i}?w=400' for i in dict.fromkeys(sample)],
+    }
+    for name, urls in routes.items(): report['routes'][name] = time_route(client, counter, urls)
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    out = json.dumps(report, indent=2); print(out)
+    if args.out: Path(args.out).write_text(out, encoding='utf-8')
+    if not args.keep: shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Generate a synthetic photo library: <root>/<album>/<YYYY-MM-DD>/IMG_xxxxx.jpg with EXIF dates and GPS.
+
+    python benchmarks/synth.py OUT_DIR --days 30 --per-day 100
+"""
+import argparse, os, random
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+def _dms(value):
+    value = abs(value); d = int(value); m = int((value - d) * 60); s = round(((value - d) * 60 - m) * 60, 2)
+    return (float(d), float(m), s)
+
+def generate_album(root, days=10, per_day=50, size=(1024, 768), gps_ratio=0.7, seed=0, start=datetime(2024, 5, 1)):
+    rnd = random.Random(seed); count = 0
+    for d in range(days):
+        day = start + timedelta(days=d); folder = os.path.join(root, day.strftime('%Y-%m-%d'))
+        os.makedirs(folder, exist_ok=True)
+        for i in range(per_day):
+            exif = Image.Exif()
+            exif[0x8769] = {0x9003: (day + timedelta(seconds=rnd.randrange(86400))).strftime('%Y:%m:%d %H:%M:%S')}
+            if rnd.random() < gps_ratio:
+                lat, lon = rnd.uniform(-60, 70), rnd.uniform(-180, 180)
+                exif[0x8825] = {1: 'N' if lat >= 0 else 'S', 2: _dms(lat), 3: 'E' if lon >= 0 else 'W', 4: _dms(lon)}
+            img = Image.new('RGB', size, tuple(rnd.randrange(256) for _ in range(3)))
+            img.save(os.path.join(folder, f'IMG_{d:03d}{i:04d}.jpg'), exif=exif, quality=85)
+            count += 1
+    return count
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('out'); ap.add_argument('--days', type=int, default=10); ap.add_argument('--per-day', type=int, default=50)
+    ap.add_argument('--width', type=int, default=1024); ap.add_argument('--height', type=int, default=768)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    n = generate_album(args.out, args.days, args.per_day, (args.width, args.height), seed=args.seed)
+    print(f'{n} photos written to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import threading
+
+class AppCache:
+    # Small in-process cache for data read on every page (album list, covers, day labels) and for
+    # derived data too costly to recompute per request (duplicate clusters). Entries never expire;
+    # the endpoints that change them invalidate explicitly. A generation counter stops a loader that
+    # raced with an invalidation from storing its stale result.
+    def __init__(self):
+        self.lock = threading.Lock(); self.data = {}; self.generation = 0
+
+    def get(self, key, loader):
+        with self.lock:
+            if key in self.data: return self.data[key]
+            generation = self.generation
+        value = loader()
+        with self.lock:
+            if generation == self.generation: self.data[key] = value
+        return value
+
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys: self.data.pop(key, None)
+            self.generation += 1
+
+    def invalidate_album(self, album_id):
+        # Duplicate clusters are cached per (distance, album scope); any album's photos can join a library-wide cluster
+        with self.lock:
+            dupes = [k for k in self.data if isinstance(k, tuple) and k[0] == 'duplicates']
+            for key in ('albums', ('days', album_id), ('count', album_id), *dupes): self.data.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        with self.lock: self.data.clear(); self.generation += 1
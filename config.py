@@ -12,5 +12,53 @@ class Config:
 
     ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG"}
 
+    # Ingestion pipeline: EXIF workers, rows per transaction, processes instead of threads
+    SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", min(16, (os.cpu_count() or 1) * 2)))
+    SCAN_BATCH_SIZE = int(os.environ.get("SCAN_BATCH_SIZE", 500))
+    SCAN_USE_PROCESSES = os.environ.get("SCAN_USE_PROCESSES", "0") == "1"
+
+    # Background scan tasks: concurrent scans, finished tasks kept in the tasks table and for how long
+    TASK_WORKERS = int(os.environ.get("TASK_WORKERS", 2))
+    TASK_KEEP_FINISHED = int(os.environ.get("TASK_KEEP_FINISHED", 100))
+    TASK_RETENTION_HOURS = int(os.environ.get("TASK_RETENTION_HOURS", 24))
+
+    # SQLite connection setup (file databases only): WAL + pragmas on every connection, request pool
+    # size, and a dedicated scan writer connection. SQLITE_TUNING=0 keeps the driver defaults.
+    SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "1") == "1"
+    SQLITE_MMAP_MB = int(os.environ.get("SQLITE_MMAP_MB", 256))
+    SQLITE_CACHE_MB = int(os.environ.get("SQLITE_CACHE_MB", 16))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 10000))
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+
+    # Folder watching (opt-in): inotify on Linux, else polling folder mtimes. Changes are synced once an
+    # album has been quiet for the debounce time, or after the max delay while it keeps changing.
+    WATCH_ALBUMS = os.environ.get("WATCH_ALBUMS", "0") == "1"
+    WATCH_MODE = os.environ.get("WATCH_MODE", "auto")  # auto | inotify | poll
+    WATCH_DEBOUNCE_SECONDS = float(os.environ.get("WATCH_DEBOUNCE_SECONDS", 2))
+    WATCH_MAX_DELAY_SECONDS = float(os.environ.get("WATCH_MAX_DELAY_SECONDS", 30))
+    WATCH_POLL_SECONDS = float(os.environ.get("WATCH_POLL_SECONDS", 10))
+
+    # Request metrics (/api/metrics): requests slower than this are logged; METRICS_PROFILE=1 also samples
+    # their stacks every METRICS_PROFILE_INTERVAL_MS and keeps the latest profiles
+    METRICS_SLOW_MS = float(os.environ.get("METRICS_SLOW_MS", 1000))
+    METRICS_PROFILE = os.environ.get("METRICS_PROFILE", "0") == "1"
+    METRICS_PROFILE_INTERVAL_MS = float(os.environ.get("METRICS_PROFILE_INTERVAL_MS", 5))
+
+    # Photos per grid page / per /api/albums/<id>/photos response
+    PHOTO_PAGE_SIZE = int(os.environ.get("PHOTO_PAGE_SIZE", 200))
+
+    # Duplicate finder: max differing dHash bits (0-8) for two photos to count as near-duplicates
+    DUPLICATE_DISTANCE = int(os.environ.get("DUPLICATE_DISTANCE", 6))
+
+    # Derivative (thumbnail/preview) cache under instance/thumbs
+    THUMB_SIZES = (200, 400, 800, 1600, 2560)
+    THUMB_GRID_WIDTH = 400
+    THUMB_VIEWER_WIDTH = 1600
+    THUMB_CACHE_MAX_BYTES = int(os.environ.get("THUMB_CACHE_MAX_MB", 2048)) * 1024 * 1024
+    THUMB_QUALITY = 82
+    THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS", 2))
+    THUMB_PREWARM = os.environ.get("THUMB_PREWARM", "1") == "1"
+
     SITE_AUTHOR = os.environ.get("SITE_AUTHOR", "Andrei Efr")
     SITE_CREATED_ON = os.environ.get("SITE_CREATED_ON", "2025-08-31")
@@ -0,0 +1,107 @@
+import hashlib, io
+
+from PIL import Image, ImageOps
+from sqlalchemy import text
+
+from models import db
+
+# Every photo gets a content hash (exact copies) and a 64-bit dHash (same picture re-encoded,
+# resized or lightly edited). Near-duplicates are found with a multi-index hash: the 64 bits are
+# split into `distance // 2 + 1` bands, so two hashes within `distance` bits agree on some band in
+# all but at most one bit. Each hash is only compared with the candidates sharing such a band, never
+# with the whole library; that is a handful at small distances but grows with the band count
+# (several hundred per hash at distance 8 on a 100k library, so the endpoint caches its result).
+# Clusters are the connected components of the "close enough" pairs. Flat or low-detail pictures
+# (solid frames, blank scans, plain skies) hash to nearly all 0s or all 1s and would all be "close"
+# to each other, chaining unrelated photos into one cluster: they only match as byte-identical copies.
+HASH_BITS = 64
+MAX_DISTANCE = 8           # more bands of fewer bits above this: candidate lists grow too long
+MASK = (1 << HASH_BITS) - 1
+popcount = getattr(int, 'bit_count', None) or (lambda v: bin(v).count('1'))
+
+def dhash(img):
+    small = img.convert('L').resize((9, 8), Image.BILINEAR)
+    px = list(small.getdata()); h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] < px[row * 9 + col + 1])
+    return h - (1 << HASH_BITS) if h >> (HASH_BITS - 1) else h  # SQLite integers are signed 64-bit
+
+def image_hashes(path):
+    # One read serves both hashes; draft() lets JPEGs decode at 1/8 scale
+    try:
+        with open(path, 'rb') as fh: data = fh.read()
+    except OSError:
+        return None, None
+    content = hashlib.blake2b(data, digest_size=16).hexdigest()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft('L', (64, 64))
+            return content, dhash(ImageOps.exif_transpose(img))
+    except Exception:
+        return content, None
+
+def _bands(distance):
+    # (shift, mask, single-bit flips of the band incl. none) per band
+    count = distance // 2 + 1; width, extra = divmod(HASH_BITS, count); bands, shift = [], 0
+    for i in range(count):
+        w = width + (i < extra); bands.append((shift, (1 << w) - 1, [0] + [1 << b for b in range(w)])); shift += w
+    return bands
+
+def low_detail(h, distance):
+    return not distance < popcount(h & MASK) < HASH_BITS - distance
+
+def cluster_hashes(items, distance=6):
+    # items: (photo_id, phash) pairs. Returns lists of photo ids, largest cluster first.
+    distance = max(0, min(int(distance), MAX_DISTANCE))
+    members = {}
+    for photo_id, h in items:
+        if h is not None and not low_detail(h, distance): members.setdefault(h & MASK, []).append(photo_id)
+    hashes = list(members); parent = list(range(len(hashes)))
+    def find(i):
+        while parent[i] != i: parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+    if distance:
+        bands = [(shift, mask, flips, {}) for shift, mask, flips in _bands(distance)]
+        for i, h in enumerate(hashes):
+            candidates = set()
+            for shift, mask, flips, table in bands:
+                key = (h >> shift) & mask
+                for f in flips:
+                    found = table.get(key ^ f)
+                    if found: candidates.update(found)
+                table.setdefault(key, []).append(i)
+            for j in candidates:
+                if popcount(h ^ hashes[j]) <= distance:
+                    ri, rj = find(i), find(j)
+                    if ri != rj: parent[ri] = rj
+    groups = {}
+    for i, h in enumerate(hashes): groups.setdefault(find(i), []).extend(members[h])
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
+
+def find_duplicates(distance=6, album_id=None):
+    scope = 'a.archived = 0' + (' AND p.album_id = :album_id' if album_id else '')
+    rows = db.session.execute(text(f'SELECT p.id, p.phash, p.content_hash FROM photos p JOIN albums a ON a.id = p.album_id '
+                                   f'WHERE {scope} AND (p.phash IS NOT NULL OR p.content_hash IS NOT NULL)'), {'album_id': album_id}).all()
+    distance = max(0, min(int(distance), MAX_DISTANCE))
+    clusters = cluster_hashes([(r.id, r.phash) for r in rows], distance)
+    # Byte-identical files that could not be decoded, or are too flat to compare by hash, still count as duplicates
+    by_content = {}
+    for r in rows:
+        if (r.phash is None or low_detail(r.phash, distance)) and r.content_hash: by_content.setdefault(r.content_hash, []).append(r.id)
+    clusters += [sorted(g) for g in by_content.values() if len(g) > 1]
+    return clusters
+
+def describe_clusters(clusters):
+    ids = [i for c in clusters for i in c]; info = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i+500]; params = {f'p{n}': v for n, v in enumerate(chunk)}
+        sql = (f'SELECT p.id, p.album_id, a.name AS album_name, p.filename, p.day_label, p.file_size, p.content_hash, p.phash '
+               f'FROM photos p JOIN albums a ON a.id = p.album_id WHERE p.id IN ({", ".join(":" + k for k in params)})')
+        for r in db.session.execute(text(sql), params).mappings(): info[r['id']] = dict(r)
+    out = []
+    for c in clusters:
+        photos = [info[i] for i in c if i in info]
+        for p in photos: p['phash'] = f"{p['phash'] & MASK:016x}" if p['phash'] is not None else None
+        out.append({'photos': photos, 'identical': len({p['content_hash'] for p in photos}) == 1})
+    return out
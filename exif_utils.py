@@ -1,6 +1,17 @@
+import struct
 from PIL import Image, ExifTags
 from datetime import datetime
 
+# Header-only reader: bounded reads of the JPEG APP1 segment / PNG eXIf chunk, decoding only the
+# handful of tags we use. Anything it can't make sense of goes through Pillow instead.
+MAX_HEADER_SCAN = 256 * 1024
+TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD, TAG_DATETIME_ORIGINAL = 0x0132, 0x8769, 0x8825, 0x9003
+GPS_TAGS = {1: 'GPSLatitudeRef', 2: 'GPSLatitude', 3: 'GPSLongitudeRef', 4: 'GPSLongitude'}
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+class _Unsupported(Exception):
+    pass
+
 def _ratio_to_float(ratio):
     try:
         return float(ratio[0]) / float(ratio[1]) if isinstance(ratio, tuple) else float(ratio)
@@ -15,7 +26,7 @@ def _convert_to_degrees(value):
     except Exception:
         return None
 
-def extract_exif_data(image_path):
+def extract_exif_data_pillow(image_path):
     try:
         img = Image.open(image_path)
         exif = img._getexif()
@@ -46,3 +57,73 @@ def extract_exif_data(image_path):
         return (created_at, lat, lon)
     except Exception:
         return (None, None, None)
+
+def _read_jpeg_app1(f):
+    if f.read(2) != b'\xff\xd8': raise _Unsupported()
+    while f.tell() < MAX_HEADER_SCAN:
+        head = f.read(4)
+        if len(head) < 4 or head[0] != 0xFF: raise _Unsupported()
+        marker, length = head[1], struct.unpack('>H', head[2:])[0]
+        if marker in (0xDA, 0xD9): return None
+        if marker == 0xE1:
+            data = f.read(length - 2)
+            if data[:6] == b'Exif\x00\x00': return data[6:]
+        else: f.seek(length - 2, 1)
+    raise _Unsupported()
+
+def _read_png_exif(f):
+    if f.read(8) != b'\x89PNG\r\n\x1a\n': raise _Unsupported()
+    while True:
+        head = f.read(8)
+        if len(head) < 8: return None
+        length, ctype = struct.unpack('>I', head[:4])[0], head[4:]
+        if ctype == b'eXIf': return f.read(length)
+        if ctype in (b'IDAT', b'IEND'): return None
+        if ctype in (b'tEXt', b'zTXt', b'iTXt'): raise _Unsupported()  # may hold a "Raw profile type exif"
+        f.seek(length + 4, 1)
+
+def _parse_ifd(tiff, offset, endian, wanted):
+    count = struct.unpack_from(endian + 'H', tiff, offset)[0]; out = {}
+    for i in range(count):
+        tag, typ, n, raw = struct.unpack_from(endian + 'HHI4s', tiff, offset + 2 + i * 12)
+        if tag not in wanted or typ not in TYPE_SIZES: continue
+        size = TYPE_SIZES[typ] * n
+        data = raw[:size] if size <= 4 else tiff[struct.unpack(endian + 'I', raw)[0]:][:size]
+        if len(data) < size: continue
+        if typ == 2: out[tag] = data.split(b'\x00', 1)[0].decode('ascii', 'replace')
+        elif typ in (5, 10): out[tag] = tuple(struct.unpack_from(endian + ('II' if typ == 5 else 'ii'), data, k * 8) for k in range(n))
+        elif typ == 3: out[tag] = struct.unpack_from(endian + 'H', data)[0]
+        elif typ in (4, 9): out[tag] = struct.unpack_from(endian + ('I' if typ == 4 else 'i'), data)[0]
+    return out
+
+def _parse_tiff(tiff):
+    endian = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if endian is None: raise _Unsupported()
+    ifd0 = _parse_ifd(tiff, struct.unpack_from(endian + 'I', tiff, 4)[0], endian, {TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD})
+    exif = _parse_ifd(tiff, ifd0[TAG_EXIF_IFD], endian, {TAG_DATETIME_ORIGINAL}) if TAG_EXIF_IFD in ifd0 else {}
+    gps = _parse_ifd(tiff, ifd0[TAG_GPS_IFD], endian, set(GPS_TAGS)) if TAG_GPS_IFD in ifd0 else {}
+    return exif.get(TAG_DATETIME_ORIGINAL) or ifd0.get(TAG_DATETIME), {GPS_TAGS[k]: v for k, v in gps.items()}
+
+def extract_exif_data(image_path):
+    try:
+        with open(image_path, 'rb') as f:
+            sig = f.read(2); f.seek(0)
+            block = _read_jpeg_app1(f) if sig == b'\xff\xd8' else _read_png_exif(f)
+        if not block: return (None, None, None)
+        dto, g = _parse_tiff(block)
+    except (_Unsupported, struct.error, KeyError, IndexError, ValueError, OSError):
+        return extract_exif_data_pillow(image_path)
+
+    created_at = None
+    if dto:
+        try: created_at = datetime.strptime(dto, "%Y:%m:%d %H:%M:%S")
+        except Exception: created_at = None
+    lat = lon = None
+    lat_ref, lat_val = g.get('GPSLatitudeRef'), g.get('GPSLatitude')
+    lon_ref, lon_val = g.get('GPSLongitudeRef'), g.get('GPSLongitude')
+    if lat_val and lon_val and lat_ref and lon_ref:
+        lat = _convert_to_degrees(lat_val); lon = _convert_to_degrees(lon_val)
+        if lat is not None and lon is not None:
+            if lat_ref.upper()=='S': lat = -lat
+            if lon_ref.upper()=='W': lon = -lon
+    return (created_at, lat, lon)
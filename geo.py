@@ -0,0 +1,81 @@
+import math
+
+from sqlalchemy import text
+
+from models import db, Photo
+
+# Photos carry Web Mercator world coordinates (geo_x, geo_y) on a 2^GRID_BITS grid, filled at scan
+# time and indexed. A cluster is a 64px square of screen pixels at the requested zoom, i.e. a
+# right shift of those coordinates. Zooms up to AGG_MAX_ZOOM are served from geo_cells, per-album
+# counts precomputed after each scan, so wide views cost the same whatever the photo count;
+# closer zooms group the photos in the viewport directly through the (geo_x, geo_y) index.
+GRID_BITS = 26
+CELL_BITS = 2             # 4 cells per 256px tile -> 64px clusters
+AGG_MAX_ZOOM = 12
+MAX_ZOOM = GRID_BITS - CELL_BITS
+MAX_LAT = 85.05112878
+
+def project(lat, lon):
+    if lat is None or lon is None: return None, None
+    lat = max(-MAX_LAT, min(MAX_LAT, lat)); size = 1 << GRID_BITS
+    x = (lon + 180.0) / 360.0 * size
+    y = (1.0 - math.log(math.tan(math.radians(lat)) + 1.0 / math.cos(math.radians(lat))) / math.pi) / 2.0 * size
+    return min(size - 1, max(0, int(x))), min(size - 1, max(0, int(y)))
+
+def _shift(zoom):
+    return max(0, GRID_BITS - (zoom + CELL_BITS))
+
+def rebuild_geo_cells(album_id, session=None):
+    session = session or db.session
+    session.execute(text('DELETE FROM geo_cells WHERE album_id = :a'), {'a': album_id})
+    for z in range(AGG_MAX_ZOOM + 1):
+        s = _shift(z)
+        session.execute(text(
+            'INSERT INTO geo_cells (album_id, zoom, cx, cy, count, sum_lat, sum_lon, photo_id) '
+            f'SELECT album_id, {z}, geo_x >> {s}, geo_y >> {s}, COUNT(*), SUM(gps_lat), SUM(gps_lon), MIN(id) '
+            f'FROM photos WHERE album_id = :a AND geo_x IS NOT NULL GROUP BY geo_x >> {s}, geo_y >> {s}'), {'a': album_id})
+    session.commit()
+
+def delete_geo_cells(album_id):
+    db.session.execute(text('DELETE FROM geo_cells WHERE album_id = :a'), {'a': album_id}); db.session.commit()
+
+def backfill_geo(batch_size=1000):
+    # Rows scanned before geo_x/geo_y existed: project them once, then rebuild their albums' cells
+    albums = set()
+    while True:
+        rows = (db.session.query(Photo.id, Photo.album_id, Photo.gps_lat, Photo.gps_lon)
+                .filter(Photo.gps_lat.isnot(None), Photo.gps_lon.isnot(None), Photo.geo_x.is_(None)).limit(batch_size).all())
+        if not rows: break
+        updates = []
+        for r in rows:
+            x, y = project(r.gps_lat, r.gps_lon); updates.append({'id': r.id, 'geo_x': x, 'geo_y': y}); albums.add(r.album_id)
+        db.session.execute(db.update(Photo), updates); db.session.commit()
+    for album_id in albums: rebuild_geo_cells(album_id)
+    return len(albums)
+
+def parse_bbox(bbox):
+    # Leaflet's toBBoxString(): west,south,east,north
+    west, south, east, north = [float(v) for v in bbox.split(',')]
+    west, east = max(-180.0, west), min(180.0, east)
+    if east - west >= 360 or west > east: west, east = -180.0, 180.0
+    x0, y0 = project(north, west); x1, y1 = project(south, east)
+    return x0, y0, x1, y1
+
+def clusters(bbox, zoom, album_id=None):
+    zoom = max(0, min(int(zoom), MAX_ZOOM)); s = _shift(zoom)
+    x0, y0, x1, y1 = parse_bbox(bbox)
+    params = {'z': zoom, 's': s, 'cx0': x0 >> s, 'cx1': x1 >> s, 'cy0': y0 >> s, 'cy1': y1 >> s,
+              'x0': x0, 'x1': x1, 'y0': y0, 'y1': y1, 'album_id': album_id}
+    album_filter = 'AND a.id = :album_id' if album_id else ''
+    if zoom <= AGG_MAX_ZOOM:
+        sql = ('SELECT g.cx, g.cy, SUM(g.count) AS n, SUM(g.sum_lat) / SUM(g.count) AS lat, SUM(g.sum_lon) / SUM(g.count) AS lon, '
+               'MIN(g.photo_id) AS photo_id FROM geo_cells g JOIN albums a ON a.id = g.album_id '
+               f'WHERE g.zoom = :z AND g.cx BETWEEN :cx0 AND :cx1 AND g.cy BETWEEN :cy0 AND :cy1 AND a.archived = 0 {album_filter} '
+               'GROUP BY g.cx, g.cy')
+    else:
+        sql = ('SELECT p.geo_x >> :s AS cx, p.geo_y >> :s AS cy, COUNT(*) AS n, AVG(p.gps_lat) AS lat, AVG(p.gps_lon) AS lon, '
+               'MIN(p.id) AS photo_id FROM photos p JOIN albums a ON a.id = p.album_id '
+               f'WHERE p.geo_x BETWEEN :x0 AND :x1 AND p.geo_y BETWEEN :y0 AND :y1 AND a.archived = 0 {album_filter} '
+               'GROUP BY cx, cy')
+    rows = db.session.execute(text(sql), params).mappings().all()
+    return zoom, [{'lat': r['lat'], 'lon': r['lon'], 'count': r['n'], 'photo_id': r['photo_id']} for r in rows]
@@ -0,0 +1,78 @@
+import base64, json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import db, Album, Photo
+
+# Keyset paging over the (created_at, id) order used by every listing. SQLite sorts NULL created_at
+# first, and row-value comparisons skip NULLs, so the NULL block is queried separately.
+
+def photo_scope(album_id, day_label=None):
+    scope = [Photo.album_id == album_id]
+    if day_label is not None: scope.append(Photo.day_label == day_label)
+    return scope
+
+def keyset_after(scope, created_at, photo_id, limit, columns=(Photo.id,)):
+    q = lambda *cond: db.session.query(*columns).filter(*scope, *cond)
+    if created_at is None:
+        rows = q(Photo.created_at.is_(None), Photo.id > photo_id).order_by(Photo.id.asc()).limit(limit).all()
+        if len(rows) < limit:
+            rows += q(Photo.created_at.isnot(None)).order_by(Photo.created_at.asc(), Photo.id.asc()).limit(limit - len(rows)).all()
+        return rows
+    return q(tuple_(Photo.created_at, Photo.id) > (created_at, photo_id)).order_by(Photo.created_at.asc(), Photo.id.asc()).limit(limit).all()
+
+def keyset_before(scope, created_at, photo_id, limit, columns=(Photo.id,)):
+    # Nearest first, i.e. in descending order
+    q = lambda *cond: db.session.query(*columns).filter(*scope, *cond)
+    if created_at is None:
+        return q(Photo.created_at.is_(None), Photo.id < photo_id).order_by(Photo.id.desc()).limit(limit).all()
+    rows = q(tuple_(Photo.created_at, Photo.id) < (created_at, photo_id)).order_by(Photo.created_at.desc(), Photo.id.desc()).limit(limit).all()
+    if len(rows) < limit:
+        rows += q(Photo.created_at.is_(None)).order_by(Photo.id.desc()).limit(limit - len(rows)).all()
+    return rows
+
+def neighbour_ids(photo, day_label=None, n=1):
+    scope = photo_scope(photo.album_id, day_label)
+    prev_ids = [r[0] for r in keyset_before(scope, photo.created_at, photo.id, n)]
+    next_ids = [r[0] for r in keyset_after(scope, photo.created_at, photo.id, n)]
+    return prev_ids, next_ids
+
+def album_page(album_id, cursor, limit, columns, day_label=None):
+    # "All photos" order is (day_label, created_at, id), NULLs first: the ix_photos_album_day_created order.
+    # A cursor is the (day_label, created_at, id) of the last row already sent; a day view stays on its day.
+    day, created_at, photo_id = cursor or (day_label, None, 0)
+    if day_label is not None: day = day_label
+    same_day = [Photo.album_id == album_id, Photo.day_label.is_(None) if day is None else Photo.day_label == day]
+    rows = keyset_after(same_day, created_at, photo_id, limit, columns)
+    if len(rows) < limit and day_label is None:
+        later = Photo.day_label.isnot(None) if day is None else Photo.day_label > day
+        rows += (db.session.query(*columns).filter(Photo.album_id == album_id, later)
+                 .order_by(Photo.day_label.asc(), Photo.created_at.asc(), Photo.id.asc()).limit(limit - len(rows)).all())
+    return rows
+
+def album_list():
+    # Non-archived albums, newest first, with their cover: the chosen photo or the first in listing order
+    cover = (db.select(Photo.id).where(Photo.album_id == Album.id).order_by(Photo.created_at.asc(), Photo.id.asc())
+             .limit(1).correlate(Album).scalar_subquery())
+    return (db.session.query(Album.id, Album.name, Album.created_at, db.func.coalesce(Album.thumbnail_photo_id, cover))
+            .filter(Album.archived == False).order_by(Album.created_at.desc()).all())
+
+def album_days(album_id):
+    rows = db.session.query(Photo.day_label).filter(Photo.album_id == album_id, Photo.day_label.isnot(None)).distinct().order_by(Photo.day_label).all()
+    return [r[0] for r in rows]
+
+def album_count(album_id):
+    return db.session.query(db.func.count(Photo.id)).filter(Photo.album_id == album_id).scalar()
+
+def encode_cursor(row):
+    raw = json.dumps([row.day_label, row.created_at.isoformat() if row.created_at else None, row.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    if not token: return None
+    try:
+        day, created_at, photo_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return day, datetime.fromisoformat(created_at) if created_at else None, int(photo_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
@@ -0,0 +1,138 @@
+import atexit, logging, os, queue, sys, threading, time
+from collections import Counter, deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Request instrumentation: wall time, SQL query count/time (engine events) and response bytes per
+# endpoint, kept as fixed-bucket histograms in memory and served by /api/metrics. Logging goes
+# through a queue so request threads never wait on file writes.
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BUCKETS_QUERY_MS = (0.1, 0.25, 0.5) + BUCKETS_MS  # most requests spend well under a millisecond in SQLite
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+BUCKETS_BYTES = tuple(1024 * 2 ** k for k in range(15))  # 1 KiB .. 16 MiB
+
+def setup_logging(logs_dir):
+    # One background listener per process; app loggers propagate to the root QueueHandler
+    root = logging.getLogger()
+    if any(isinstance(h, QueueHandler) for h in root.handlers): return
+    file_all = RotatingFileHandler(str(logs_dir / 'app.log'), maxBytes=5*1024*1024, backupCount=3, encoding='utf-8')
+    file_err = RotatingFileHandler(str(logs_dir / 'error.log'), maxBytes=2*1024*1024, backupCount=5, encoding='utf-8')
+    console = logging.StreamHandler()  # replaces Flask's default handler, which isn't attached once the root logger has one
+    fmt = logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s')
+    file_all.setFormatter(fmt); file_err.setFormatter(fmt); console.setFormatter(fmt)
+    file_all.setLevel(logging.DEBUG); file_err.setLevel(logging.ERROR); console.setLevel(logging.INFO)
+    records = queue.SimpleQueue(); listener = QueueListener(records, file_all, file_err, console, respect_handler_level=True)
+    root.setLevel(logging.INFO); root.addHandler(QueueHandler(records))
+    listener.start(); atexit.register(listener.stop)
+
+class Histogram:
+    # Fixed upper-bound buckets; snapshot keys carry the unit (avg_ms, p95_queries, ...)
+    def __init__(self, buckets=BUCKETS_MS, unit='ms'):
+        self.bounds = buckets; self.unit = unit
+        self.counts = [0] * (len(buckets) + 1); self.total = 0; self.sum = 0.0; self.max = 0.0
+
+    def add(self, value):
+        i = next((i for i, b in enumerate(self.bounds) if value <= b), len(self.bounds))
+        self.counts[i] += 1; self.total += 1; self.sum += value; self.max = max(self.max, value)
+
+    def percentile(self, pct):
+        # Upper bound of the bucket holding the pct-th request
+        seen, rank = 0, pct / 100 * self.total
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank: return self.bounds[i] if i < len(self.bounds) else round(self.max, 2)
+        return 0
+
+    def snapshot(self):
+        u = self.unit
+        return {'count': self.total, f'avg_{u}': round(self.sum / self.total, 2) if self.total else 0, f'max_{u}': round(self.max, 2),
+                f'p50_{u}': self.percentile(50), f'p95_{u}': self.percentile(95), f'p99_{u}': self.percentile(99),
+                'buckets': {(f'le_{b}' if i < len(self.bounds) else 'inf'): n for i, (b, n) in enumerate(zip(self.bounds + (None,), self.counts)) if n}}
+
+class EndpointStats:
+    def __init__(self):
+        self.wall = Histogram(); self.errors = 0
+        self.queries = Histogram(BUCKETS_QUERIES, 'queries'); self.query_ms = Histogram(BUCKETS_QUERY_MS, 'ms'); self.bytes = Histogram(BUCKETS_BYTES, 'bytes')
+
+    def add(self, ms, queries, query_ms, size, status):
+        self.wall.add(ms); self.queries.add(queries); self.query_ms.add(query_ms); self.bytes.add(size)
+        if status >= 500: self.errors += 1
+
+    def snapshot(self):
+        # Wall time at the top level; per-request query count, query time and response size as their own histograms
+        return {**self.wall.snapshot(), 'errors': self.errors, 'queries': self.queries.snapshot(), 'query_time': self.query_ms.snapshot(),
+                'bytes': {**self.bytes.snapshot(), 'total_bytes': int(self.bytes.sum)}}
+
+class SlowRequestSampler:
+    # Opt-in sampling profiler: a thread snapshots the stacks of requests that have been running for
+    # longer than threshold_ms; when such a request ends, its most frequent stacks are kept.
+    def __init__(self, threshold_ms, interval_ms=5, keep=20):
+        self.threshold = threshold_ms / 1000; self.interval = interval_ms / 1000
+        self.lock = threading.Lock(); self.active = {}; self.wake = threading.Event(); self.recent = deque(maxlen=keep)
+        threading.Thread(target=self._run, name='slow-request-sampler', daemon=True).start()
+
+    def begin(self):
+        with self.lock: self.active[threading.get_ident()] = (time.perf_counter(), Counter())
+        self.wake.set()
+
+    def end(self, label, elapsed_ms):
+        with self.lock: entry = self.active.pop(threading.get_ident(), None)
+        if entry is None or not entry[1]: return None
+        stacks = entry[1]; profile = {'endpoint': label, 'ms': round(elapsed_ms, 1), 'samples': sum(stacks.values()),
+                                      'stacks': [{'stack': s, 'samples': n} for s, n in stacks.most_common(10)]}
+        self.recent.append(profile); return profile
+
+    @staticmethod
+    def _collapse(frame, depth=40):
+        parts = []
+        while frame is not None and len(parts) < depth:
+            code = frame.f_code; parts.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}'); frame = frame.f_back
+        return ';'.join(reversed(parts))
+
+    def _run(self):
+        while True:
+            with self.lock: idle = not self.active
+            if idle: self.wake.wait(); self.wake.clear(); continue
+            time.sleep(self.interval); now = time.perf_counter(); frames = sys._current_frames()
+            with self.lock:
+                for tid, (start, stacks) in self.active.items():
+                    if now - start >= self.threshold and tid in frames: stacks[self._collapse(frames[tid])] += 1
+
+class RequestMetrics:
+    def __init__(self, slow_ms=1000, profile=False, profile_interval_ms=5, logger=None):
+        self.lock = threading.Lock(); self.local = threading.local(); self.endpoints = {}; self.started = time.time()
+        self.slow_ms = slow_ms; self.logger = logger
+        self.sampler = SlowRequestSampler(slow_ms, profile_interval_ms) if profile else None
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None: context._metrics_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_start', None)
+        if started is not None and getattr(self.local, 'active', False):  # background tasks and startup are not requests
+            self.local.queries += 1; self.local.query_ms += (time.perf_counter() - started) * 1000
+
+    def begin(self):
+        self.local.active = True; self.local.queries = 0; self.local.query_ms = 0.0; self.local.t0 = time.perf_counter()
+        if self.sampler: self.sampler.begin()
+
+    def end(self, label, status, size):
+        if not getattr(self.local, 'active', False): return None
+        self.local.active = False; ms = (time.perf_counter() - self.local.t0) * 1000
+        profile = self.sampler.end(label, ms) if self.sampler else None
+        with self.lock:
+            stats = self.endpoints.get(label) or self.endpoints.setdefault(label, EndpointStats())
+            stats.add(ms, self.local.queries, self.local.query_ms, size or 0, status)
+        if ms >= self.slow_ms and self.logger:
+            top = f" top={';'.join(profile['stacks'][0]['stack'].split(';')[-3:])}" if profile else ''
+            self.logger.warning(f'Slow request {label} {ms:.0f}ms queries={self.local.queries}{top}')
+        return ms, self.local.queries, self.local.query_ms
+
+    def snapshot(self):
+        with self.lock: endpoints = {label: s.snapshot() for label, s in sorted(self.endpoints.items())}
+        out = {'uptime_seconds': round(time.time() - self.started), 'buckets_ms': list(BUCKETS_MS), 'endpoints': endpoints}
+        if self.sampler: out['slow_requests'] = list(self.sampler.recent)
+        return out
+
+    def reset(self):
+        with self.lock: self.endpoints = {}; self.started = time.time()
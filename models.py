@@ -16,6 +16,11 @@ class Album(db.Model):
 
 class Photo(db.Model):
     __tablename__ = "photos"
+    __table_args__ = (
+        db.Index("ix_photos_album_created", "album_id", "created_at", "id"),
+        db.Index("ix_photos_album_day_created", "album_id", "day_label", "created_at", "id"),
+        db.Index("ix_photos_geo", "geo_x", "geo_y"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     album_id = db.Column(db.Integer, db.ForeignKey("albums.id"), nullable=False)
     file_path = db.Column(db.String(2048), nullable=False)
@@ -26,3 +31,39 @@ class Photo(db.Model):
     created_at = db.Column(db.DateTime, nullable=True)
     gps_lat = db.Column(db.Float, nullable=True)
     gps_lon = db.Column(db.Float, nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    file_mtime = db.Column(db.Float, nullable=True)
+    file_inode = db.Column(db.Integer, nullable=True)
+    geo_x = db.Column(db.Integer, nullable=True)
+    geo_y = db.Column(db.Integer, nullable=True)
+    content_hash = db.Column(db.String(32), nullable=True)
+    phash = db.Column(db.BigInteger, nullable=True)
+    hash_mtime = db.Column(db.Float, nullable=True)
+
+class GeoCell(db.Model):
+    __tablename__ = "geo_cells"
+    zoom = db.Column(db.Integer, primary_key=True)
+    cx = db.Column(db.Integer, primary_key=True)
+    cy = db.Column(db.Integer, primary_key=True)
+    album_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    sum_lat = db.Column(db.Float, nullable=False)
+    sum_lon = db.Column(db.Float, nullable=False)
+    photo_id = db.Column(db.Integer, nullable=False)
+
+class Task(db.Model):
+    __tablename__ = "tasks"
+    id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False, default="scan")
+    key = db.Column(db.String(1024), nullable=False, index=True)
+    path = db.Column(db.String(1024), nullable=False)
+    state = db.Column(db.String(16), nullable=False, default="pending", index=True)
+    album_id = db.Column(db.Integer, nullable=True)
+    album_name = db.Column(db.String(255), nullable=True)
+    progress = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    message = db.Column(db.Text, nullable=True)
+    trace = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
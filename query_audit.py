@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from models import db, Photo
+from keyset import photo_scope, keyset_after, keyset_before, album_page, album_list, album_days, album_count
+
+# Runs the real query builders behind the main pages and EXPLAINs every statement they send, so the
+# audit follows the code (including the NULL-block branches) instead of a copy of its queries.
+PAGE_COLUMNS = (Photo.id, Photo.day_label, Photo.created_at, Photo.user_title, Photo.filename)
+
+def sample_photo():
+    # A photo with a date and a day label if the library has one; the plans don't depend on the values
+    photo = (db.session.query(Photo.id, Photo.album_id, Photo.day_label, Photo.created_at)
+             .filter(Photo.created_at.isnot(None), Photo.day_label.isnot(None)).first())
+    return photo or SimpleNamespace(id=1, album_id=1, day_label='2024-01-01', created_at=datetime(2024, 1, 1))
+
+def hot_queries(photo=None):
+    # (name, callable running the real builder, index every statement it sends must use, whether a
+    # temp B-tree sort is acceptable). The limit exceeds the album size so every fallback branch runs.
+    p = photo or sample_photo(); album_id = p.album_id; limit = album_count(album_id) + 1
+    scope, day_scope = photo_scope(album_id), photo_scope(album_id, p.day_label)
+    cursor = (p.day_label, p.created_at, p.id)
+    return [
+        ('next_ids', lambda: keyset_after(scope, p.created_at, p.id, limit), 'ix_photos_album_created', False),
+        ('prev_ids', lambda: keyset_before(scope, p.created_at, p.id, limit), 'ix_photos_album_created', False),
+        ('next_ids_null_block', lambda: keyset_after(scope, None, 0, limit), 'ix_photos_album_created', False),
+        ('prev_ids_null_block', lambda: keyset_before(scope, None, p.id, limit), 'ix_photos_album_created', False),
+        ('day_next_ids', lambda: keyset_after(day_scope, p.created_at, p.id, limit), 'ix_photos_album_day_created', False),
+        ('day_prev_ids', lambda: keyset_before(day_scope, p.created_at, p.id, limit), 'ix_photos_album_day_created', False),
+        ('album_page_first', lambda: album_page(album_id, None, limit, PAGE_COLUMNS), 'ix_photos_album_day_created', False),
+        ('album_page_after', lambda: album_page(album_id, cursor, limit, PAGE_COLUMNS), 'ix_photos_album_day_created', False),
+        ('day_page', lambda: album_page(album_id, None, limit, PAGE_COLUMNS, p.day_label), 'ix_photos_album_day_created', False),
+        # Albums are few and sorted in memory; the correlated cover lookup per album must stay indexed
+        ('album_list', album_list, 'ix_photos_album_created', True),
+        ('album_days', lambda: album_days(album_id), 'ix_photos_album_day_created', False),
+        ('album_count', lambda: album_count(album_id), 'ix_photos_album_', False),
+    ]
+
+@contextmanager
+def recorded_statements(engine):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany): statements.append((statement, parameters))
+    event.listen(engine, 'before_cursor_execute', record)
+    try: yield statements
+    finally: event.remove(engine, 'before_cursor_execute', record)
+
+def explain(conn, statement, parameters=()):
+    return [r[-1] for r in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()]
+
+def audit_query_plans(queries=None):
+    # Needs an app context; returns {name: {'plan', 'issues'}} for the queries that lost their index
+    problems = {}
+    for name, run, index, sorts_ok in queries or hot_queries():
+        with recorded_statements(db.engine) as statements: run()
+        db.session.rollback()
+        if not statements: problems[name] = {'plan': [], 'issues': ['sent no query']}; continue
+        with db.engine.connect() as conn: plans = [explain(conn, s, params) for s, params in statements]
+        issues = []
+        for plan in plans:
+            if not any(index in step for step in plan): issues.append(f'does not use {index}')
+            issues += [step for step in plan if (step.startswith('SCAN photos') and 'INDEX' not in step) or ('TEMP B-TREE' in step and not sorts_ok)]
+        if issues: problems[name] = {'plan': [step for plan in plans for step in plan], 'issues': issues}
+    return problems
@@ -0,0 +1,217 @@
+import os, threading, time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from models import db, Album, Photo
+from exif_utils import extract_exif_data
+from geo import project
+from dupes import image_hashes
+
+ScannedFile = namedtuple('ScannedFile', 'path filename day_label size mtime inode')
+# What a sync wrote: ids of added, changed and moved rows, and whether any GPS-tagged row was touched
+ScanChanges = namedtuple('ScanChanges', 'photo_ids geo')
+
+def _list_dir(path, allowed_extensions):
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False): dirs.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1] in allowed_extensions: files.append(entry)
+                except OSError: continue
+    except OSError: pass
+    files.sort(key=lambda e: e.name)
+    return files, dirs
+
+def _to_scanned(entry, day_label):
+    # The listing can be stale by the time it is stat'ed (watch mode syncs while files arrive or move):
+    # skip the entry, the next rescan sees it
+    try: st = entry.stat()
+    except OSError: return None
+    try: inode = entry.inode() or None
+    except OSError: inode = None
+    return ScannedFile(entry.path, entry.name, day_label, st.st_size, st.st_mtime, inode)
+
+def scan_scope(album_path, dirs=None):
+    # Folders to sync as (day label, recursive) pairs, None for the whole album. `dirs` are
+    # (folder, recursive) pairs, e.g. the folders a watcher saw change; folders covered by a
+    # recursive ancestor are dropped, and anything outside the album is ignored.
+    if dirs is None: return None
+    root = Path(album_path).resolve(); scope = {}
+    for d, recursive in dirs:
+        try: rel = Path(d).relative_to(root).as_posix()
+        except ValueError: continue
+        label = None if rel == '.' else rel
+        scope[label] = scope.get(label, False) or recursive
+    if scope.get(None): return None
+    covered = lambda label: any(r and label.startswith(other + '/') for other, r in scope.items() if other is not None)
+    return sorted(((label, r) for label, r in scope.items() if label is None or not covered(label)), key=lambda s: s[0] or '')
+
+def _walk(root, label, recursive, allowed_extensions):
+    files, pending = _list_dir(os.path.join(root, label) if label else root, allowed_extensions)
+    for entry in files:
+        f = _to_scanned(entry, label)
+        if f: yield f
+    if not recursive: return
+    subdirs = []
+    while pending:
+        d = pending.pop()
+        subdirs.append(d)
+        pending.extend(_list_dir(d, ())[1])
+    for d in sorted(subdirs, key=lambda p: Path(p).relative_to(root).as_posix()):
+        rel = Path(d).relative_to(root).as_posix()
+        for entry in _list_dir(d, allowed_extensions)[0]:
+            f = _to_scanned(entry, rel)
+            if f: yield f
+
+def iter_album_files(album_path, allowed_extensions, scope=None):
+    # Root files have no day label; every (nested) subfolder is a day labelled by its relative path.
+    root = str(Path(album_path).resolve())
+    for label, recursive in scope if scope is not None else [(None, True)]:
+        yield from _walk(root, label, recursive, allowed_extensions)
+
+def scope_filter(scope):
+    # Photo rows inside a scan scope: a folder's day label is its path relative to the album
+    conds = []
+    for label, recursive in scope:
+        if label is None: conds.append(Photo.day_label.is_(None)); continue
+        conds.append(Photo.day_label == label)
+        if recursive: conds.append(Photo.day_label.startswith(label + '/', autoescape=True))
+    return db.or_(*conds) if conds else db.false()
+
+def read_photo_fields(f: ScannedFile):
+    created_at, lat, lon = extract_exif_data(f.path)
+    if created_at is None:
+        try: created_at = datetime.fromtimestamp(f.mtime)
+        except Exception: created_at = None
+    geo_x, geo_y = project(lat, lon); content_hash, phash = image_hashes(f.path)
+    return dict(created_at=created_at, gps_lat=lat, gps_lon=lon, geo_x=geo_x, geo_y=geo_y, content_hash=content_hash, phash=phash,
+                hash_mtime=f.mtime, file_size=f.size, file_mtime=f.mtime, file_inode=f.inode)
+
+class ScanCancelled(Exception):
+    pass
+
+class ScanProgress:
+    # Counters shared with the task API; written by the scanning thread only.
+    def __init__(self):
+        self.phase = 'walking'; self.discovered = 0; self.to_process = 0; self.processed = 0; self.bytes_processed = 0
+        self.started = time.time(); self.cancel_event = threading.Event()
+
+    def check(self):
+        if self.cancel_event.is_set(): raise ScanCancelled('Scan cancelled')
+
+    def snapshot(self):
+        elapsed = max(time.time() - self.started, 1e-6); rate = self.processed / elapsed
+        eta = (self.to_process - self.processed) / rate if self.phase != 'walking' and rate > 0 else None
+        return {'phase': self.phase, 'files_discovered': self.discovered, 'files_to_process': self.to_process,
+                'files_processed': self.processed, 'bytes_processed': self.bytes_processed, 'elapsed_seconds': round(elapsed, 1),
+                'rate_per_second': round(rate, 1), 'eta_seconds': round(eta, 1) if eta is not None else None}
+
+class BatchWriter:
+    def __init__(self, batch_size=500, session=None):
+        self.batch_size = max(1, int(batch_size)); self.inserts = []; self.updates = []; self.session = session or db.session
+
+    def insert(self, row):
+        self.inserts.append(row)
+        if len(self.inserts) >= self.batch_size: self.flush()
+
+    def update(self, row):
+        self.updates.append(row)
+        if len(self.updates) >= self.batch_size: self.flush()
+
+    def flush(self):
+        if self.inserts: self.session.execute(db.insert(Photo), self.inserts); self.inserts = []
+        if self.updates: self.session.execute(db.update(Photo), self.updates); self.updates = []
+        self.session.commit()
+
+def sync_album(album, album_path, allowed_extensions, workers=4, batch_size=500, use_processes=False, progress=None, session=None, dirs=None):
+    # Stages: the walker diffs stat snapshots and feeds EXIF reads to a pool while it walks;
+    # this (single) writer thread then applies the results in batched transactions.
+    # `dirs` limits the sync to those (folder, recursive) pairs; rows elsewhere in the album are left alone.
+    # Returns (stats, ScanChanges) so callers only refresh derived data for what was written.
+    stats = {'added': 0, 'updated': 0, 'moved': 0, 'removed': 0, 'unchanged': 0}
+    session = session or db.session
+    scope = scan_scope(album_path, dirs)
+    q = session.query(Photo.id, Photo.file_path, Photo.filename, Photo.day_label, Photo.user_title, Photo.file_size,
+                      Photo.file_mtime, Photo.file_inode, Photo.hash_mtime, Photo.geo_x).filter(Photo.album_id == album.id)
+    rows = (q.filter(scope_filter(scope)) if scope is not None else q).all()
+    last_id = session.query(db.func.max(Photo.id)).scalar() or 0  # rows inserted by this scan get larger ids
+    known = {r.file_path: r for r in rows}
+    # A new path whose inode/size/mtime match a known row is probably that row moved: don't read it during the walk
+    by_inode = {(r.file_inode, r.file_size): r for r in rows if r.file_inode}
+    session.commit()  # hand the connection back: the walk and EXIF reads below can take minutes
+    new_files, changed, touched, geo = [], [], [], False
+    progress = progress or ScanProgress()
+    def done(f): progress.processed += 1; progress.bytes_processed += f.size; progress.check()
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    writer = BatchWriter(batch_size, session)
+    with pool_cls(max_workers=max(1, int(workers))) as pool:
+        try:
+            for f in iter_album_files(album_path, allowed_extensions, scope):
+                progress.discovered += 1
+                if progress.discovered % 256 == 0: progress.check()
+                r = known.pop(f.path, None)
+                if r is None:
+                    moved = by_inode.get((f.inode, f.size)) if f.inode else None
+                    fut = None if moved is not None and moved.file_mtime == f.mtime else pool.submit(read_photo_fields, f)
+                    new_files.append((f, fut)); progress.to_process += 1; continue
+                # hash_mtime records the last hashing attempt, so rows scanned before hashing existed are re-read once
+                # and files that can't be hashed are not re-read on every rescan
+                stale = (r.file_size, r.file_mtime) != (f.size, f.mtime) or r.hash_mtime != f.mtime
+                if not stale and r.file_inode == f.inode and r.day_label == f.day_label:
+                    stats['unchanged'] += 1; continue
+                fut = pool.submit(read_photo_fields, f) if stale else None
+                changed.append((r, f, fut)); progress.to_process += 1
+
+            progress.phase = 'processing'
+            for r, f, fut in changed:
+                fields = fut.result() if fut else dict(file_size=f.size, file_mtime=f.mtime, file_inode=f.inode)
+                geo = geo or r.geo_x is not None or fields.get('geo_x') is not None; touched.append(r.id)
+                writer.update(dict(fields, id=r.id, day_label=f.day_label)); stats['updated'] += 1; done(f)
+
+            # A vanished path whose inode/size reappears elsewhere is a move: keep the row (and the user's edits).
+            missing = {(r.file_inode, r.file_size): r for r in known.values() if r.file_inode}
+            matched = []
+            for f, fut in new_files:
+                r = missing.pop((f.inode, f.size), None) if f.inode else None
+                if r is not None: known.pop(r.file_path, None)
+                # Reads skipped during the walk that turn out to be needed (not a move after all, or touched since)
+                if fut is None and (r is None or r.file_mtime != f.mtime): fut = pool.submit(read_photo_fields, f)
+                matched.append((f, fut, r))
+            new_files = [(f, fut) for f, fut, r in matched]
+            for f, fut, r in matched:
+                if r is not None:
+                    if r.file_mtime != f.mtime: fields = fut.result(); geo = geo or r.geo_x is not None or fields['geo_x'] is not None
+                    else:
+                        if fut: fut.cancel()
+                        fields = dict(file_mtime=f.mtime)
+                    title = os.path.splitext(f.filename)[0] if r.user_title == os.path.splitext(r.filename)[0] else r.user_title
+                    writer.update(dict(fields, id=r.id, file_path=f.path, filename=f.filename, day_label=f.day_label, user_title=title))
+                    touched.append(r.id); stats['moved'] += 1; done(f)
+                else:
+                    fields = fut.result(); geo = geo or fields['geo_x'] is not None
+                    writer.insert(dict(fields, album_id=album.id, file_path=f.path, filename=f.filename, day_label=f.day_label,
+                                       user_title=os.path.splitext(f.filename)[0]))
+                    stats['added'] += 1; done(f)
+            writer.flush()
+        except ScanCancelled:
+            for item in changed + new_files:
+                if item[-1]: item[-1].cancel()
+            writer.flush()  # keep what was already read; the next rescan picks up the rest
+            raise
+
+    progress.phase = 'cleanup'
+    gone = [r.id for r in known.values()]; geo = geo or any(r.geo_x is not None for r in known.values())
+    for i in range(0, len(gone), 500):
+        session.query(Photo).filter(Photo.id.in_(gone[i:i+500])).delete(synchronize_session=False)
+    stats['removed'] = len(gone)
+    if album.thumbnail_photo_id in set(gone):
+        session.query(Album).filter(Album.id == album.id).update({'thumbnail_photo_id': None}); album.thumbnail_photo_id = None
+    if stats['added']: touched += [r.id for r in session.query(Photo.id).filter(Photo.album_id == album.id, Photo.id > last_id)]
+    session.commit()
+    stats['photos_scanned'] = stats['added'] + stats['updated'] + stats['moved'] + stats['unchanged']
+    progress.phase = 'done'
+    return stats, ScanChanges(touched, geo)
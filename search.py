@@ -0,0 +1,59 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+# Full-text index over photo titles, descriptions and filenames. photos_fts is an FTS5
+# external-content table: it stores only the index, and triggers on photos keep it in sync
+# with scans (bulk inserts/updates/deletes) and with title/description edits.
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE photos_fts USING fts5(user_title, user_description, filename, "
+    "content='photos', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS photos_fts_ai AFTER INSERT ON photos BEGIN "
+    "INSERT INTO photos_fts(rowid, user_title, user_description, filename) VALUES (new.id, new.user_title, new.user_description, new.filename); END",
+    "CREATE TRIGGER IF NOT EXISTS photos_fts_ad AFTER DELETE ON photos BEGIN "
+    "INSERT INTO photos_fts(photos_fts, rowid, user_title, user_description, filename) VALUES ('delete', old.id, old.user_title, old.user_description, old.filename); END",
+    "CREATE TRIGGER IF NOT EXISTS photos_fts_au AFTER UPDATE OF user_title, user_description, filename ON photos BEGIN "
+    "INSERT INTO photos_fts(photos_fts, rowid, user_title, user_description, filename) VALUES ('delete', old.id, old.user_title, old.user_description, old.filename); "
+    "INSERT INTO photos_fts(rowid, user_title, user_description, filename) VALUES (new.id, new.user_title, new.user_description, new.filename); END",
+]
+# bm25 column weights: title, description, filename
+RANK = 'bm25(photos_fts, 10.0, 4.0, 1.0)'
+
+def ensure_search_index(conn):
+    try:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name='photos_fts'")).first()
+        if not exists:
+            for ddl in FTS_DDL: conn.execute(text(ddl))
+            conn.execute(text("INSERT INTO photos_fts(photos_fts) VALUES ('rebuild')"))
+        else:
+            for ddl in FTS_DDL[1:]: conn.execute(text(ddl))
+        conn.commit(); return True
+    except OperationalError as e:
+        conn.rollback()
+        if 'no such module: fts5' not in str(e): raise
+        return False  # SQLite built without FTS5: search falls back to LIKE
+
+def fts_query(q):
+    # Every word must match, as a prefix; quoting keeps FTS5 operators in user input literal
+    words = re.findall(r'\w+', q, flags=re.UNICODE)
+    return ' '.join(f'"{w}"*' for w in words)
+
+def search_photos(q, limit=50, offset=0, album_id=None, use_fts=True):
+    cols = ('p.id, p.album_id, a.name AS album_name, p.user_title, p.filename, p.day_label, p.created_at')
+    scope = 'a.archived = 0' + (' AND p.album_id = :album_id' if album_id else '')
+    params = {'limit': limit, 'offset': offset, 'album_id': album_id}
+    if use_fts:
+        match = fts_query(q)
+        if not match: return []
+        sql = (f'SELECT {cols} FROM photos_fts JOIN photos p ON p.id = photos_fts.rowid JOIN albums a ON a.id = p.album_id '
+               f'WHERE photos_fts MATCH :match AND {scope} ORDER BY {RANK}, p.id LIMIT :limit OFFSET :offset')
+        params['match'] = match
+    else:
+        sql = (f'SELECT {cols} FROM photos p JOIN albums a ON a.id = p.album_id '
+               f'WHERE (p.user_title LIKE :like OR p.user_description LIKE :like OR p.filename LIKE :like) AND {scope} '
+               f'ORDER BY p.created_at, p.id LIMIT :limit OFFSET :offset')
+        params['like'] = f'%{q.strip()}%'
+    return db.session.execute(text(sql), params).mappings().all()
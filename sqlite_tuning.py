@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+# Connection setup for file-backed SQLite. WAL lets page loads keep reading while a scan writes;
+# the other pragmas trade a little durability (NORMAL fsyncs at checkpoints only) for throughput.
+# Scans write through their own single-connection engine, so concurrent imports take turns per
+# batch there instead of competing with request threads for the write lock. A scan only holds that
+# connection while it writes a batch, and waiting for it is never an error (no pool timeout).
+
+def is_file_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') and 'mode=memory' not in str(url)
+
+def pragmas(config):
+    return {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'temp_store': 'MEMORY',
+            'mmap_size': config['SQLITE_MMAP_MB'] * 1024 * 1024, 'cache_size': -config['SQLITE_CACHE_MB'] * 1024,
+            'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS']}
+
+def engine_options(config):
+    # Flask's threaded server runs one thread per request; background tasks and thumbnail workers add a few more
+    if not config['SQLITE_TUNING'] or not is_file_sqlite(config['SQLALCHEMY_DATABASE_URI']): return {}
+    return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'], 'pool_timeout': 30}
+
+def apply_pragmas(engine, values):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        for name, value in values.items(): cur.execute(f'PRAGMA {name}={value}')
+        cur.close()
+
+def setup_engines(engine, config):
+    # Returns the session factory scans write through
+    if not config['SQLITE_TUNING'] or not is_file_sqlite(engine.url): return sessionmaker(bind=engine)
+    values = pragmas(config); apply_pragmas(engine, values)
+    writer = create_engine(engine.url, pool_size=1, max_overflow=0, pool_timeout=None)
+    apply_pragmas(writer, values)
+    return sessionmaker(bind=writer)
@@ -74,6 +74,7 @@
       inputPath.value = fsPath.value.trim();
       hide(modal);
     });
+    on(closeBtn, 'click', ()=> hide(modal));
     // Allow Esc to close
     on(document, 'keydown', (e)=>{
       if(e.key === 'Escape') hide(modal);
@@ -84,9 +85,6 @@
   });
 })();
 
-  // Close button
-  closeBtn && closeBtn.addEventListener('click', ()=> hide(modal));
-
 
 (function(){
   function $(id){ return document.getElementById(id); }
@@ -94,6 +92,23 @@
   function show(el){ if(el){ el.classList.remove('hidden'); el.style.display='block'; } }
   function hide(el){ if(el){ el.classList.add('hidden'); el.style.display='none'; } }
 
+  function formatBytes(n){
+    const units = ['B','KB','MB','GB','TB']; let i = 0;
+    while(n >= 1024 && i < units.length-1){ n /= 1024; i++; }
+    return n.toFixed(i ? 1 : 0) + ' ' + units[i];
+  }
+
+  function showProgress(p){
+    const bar = $('wait-progress-bar'), text = $('wait-progress-text');
+    if(!p || !bar || !text) return;
+    const pct = p.files_to_process ? Math.min(100, 100 * p.files_processed / p.files_to_process) : 0;
+    bar.style.width = (p.phase === 'walking' ? 0 : pct) + '%';
+    let line = `${p.files_discovered} files found · ${p.files_processed}/${p.files_to_process} new or changed read · ${formatBytes(p.bytes_processed)}`;
+    if(p.rate_per_second) line += ` · ${p.rate_per_second}/s`;
+    if(p.eta_seconds != null) line += ` · ~${Math.ceil(p.eta_seconds)}s left`;
+    text.textContent = line;
+  }
+
   async function addAlbumAsync(){
     const pathInput = $('album-path');
     const waitModal = $('wait-modal');
@@ -112,12 +127,20 @@
       if(!task_id) throw new Error('No task id');
 
       // Poll
-      let tries = 0;
+      const cancelBtn = $('wait-cancel');
+      if(cancelBtn){
+        cancelBtn.disabled = false;
+        cancelBtn.onclick = async ()=>{
+          cancelBtn.disabled = true;
+          try{ await fetch(`/api/tasks/${task_id}/cancel`, {method:'POST'}); }catch(e){ console.error(e); }
+        };
+      }
       while(true){
         await new Promise(r=> setTimeout(r, 800));
         const st = await fetch(`/api/tasks/${task_id}`);
         if(!st.ok) throw new Error('Task not found');
         const data = await st.json();
+        showProgress(data.progress);
         if(data.state === 'done'){
           hide(waitModal);
           alert(`Scanned ${data.photos_scanned} photos for album "${data.album_name}".`);
@@ -127,10 +150,13 @@
           hide(waitModal);
           alert('Error: ' + (data.message || 'Unknown error'));
           return;
+        }else if(data.state === 'cancelled'){
+          hide(waitModal);
+          alert('Scan cancelled. Photos read so far were kept; rescan to finish.');
+          window.location.reload();
+          return;
         }
-        // still pending...
-        tries++;
-        // (Optional) could add timeout; leaving it open for long scans
+        // still pending / running
       }
     }catch(err){
       console.error(err);
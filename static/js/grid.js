@@ -0,0 +1,57 @@
+// Infinite scroll for photo grids: the first page is rendered by the server, further pages come from
+// /api/albums/<id>/photos?cursor=... and are appended to the matching day group.
+(function(){
+  const root = document.getElementById('photo-groups');
+  const sentinel = document.getElementById('grid-sentinel');
+  if(!root || !sentinel) return;
+  const {api, day, context, thumbWidth} = root.dataset;
+  let cursor = root.dataset.nextCursor;
+  let loading = false;
+
+  function groupGrid(name){
+    const last = root.lastElementChild;
+    if(last && last.dataset.group === name) return last.querySelector('.photo-grid');
+    const group = document.createElement('div');
+    group.className = 'group'; group.dataset.group = name;
+    const title = document.createElement('div');
+    title.className = 'group-title'; title.textContent = name;
+    const grid = document.createElement('div');
+    grid.className = 'photo-grid';
+    group.append(title, grid); root.appendChild(group);
+    return grid;
+  }
+
+  function addTile(p){
+    const a = document.createElement('a');
+    a.href = `/photos/${p.id}?context=${encodeURIComponent(context)}`;
+    const img = document.createElement('img');
+    img.loading = 'lazy'; img.alt = p.title || '';
+    img.src = `/photo/thumb/${p.id}?w=${thumbWidth}`;
+    a.appendChild(img); groupGrid(p.group).appendChild(a);
+  }
+
+  async function loadMore(){
+    if(loading || !cursor) return;
+    loading = true;
+    try{
+      const params = new URLSearchParams({cursor});
+      if(day) params.set('day', day);
+      const res = await fetch(`${api}?${params}`);
+      if(!res.ok) throw new Error('Failed to load photos');
+      const data = await res.json();
+      data.photos.forEach(addTile);
+      cursor = data.next_cursor;
+      if(!cursor){ sentinel.textContent = ''; observer.disconnect(); }
+      else{ observer.unobserve(sentinel); observer.observe(sentinel); }  // re-check if the sentinel is still visible
+    }catch(e){
+      console.error(e); sentinel.textContent = 'Could not load more photos.';
+    }finally{
+      loading = false;
+    }
+  }
+
+  const observer = new IntersectionObserver((entries)=>{
+    if(entries.some(e=> e.isIntersecting)) loadMore();
+  }, {rootMargin:'1200px 0px'});
+  if(cursor) observer.observe(sentinel);
+})();
@@ -0,0 +1,59 @@
+// Photo map: the server returns one marker per on-screen cluster for the current view, so the
+// browser only ever holds a few hundred markers whatever the size of the library.
+(function(){
+  const el = document.getElementById('photo-map');
+  if(!el || !window.L) return;
+  const status = document.getElementById('map-status');
+  const {api, albumId, tiles} = el.dataset;
+  const map = L.map(el, {worldCopyJump:true}).setView([20, 0], 2);
+  L.tileLayer(tiles, {
+    maxZoom: 19, attribution: '&copy; OpenStreetMap contributors'
+  }).addTo(map);
+  const layer = L.layerGroup().addTo(map);
+  let seq = 0;
+
+  function icon(count){
+    const size = count < 10 ? 30 : count < 100 ? 36 : count < 1000 ? 42 : 50;
+    return L.divIcon({className:'map-cluster', html:`<span>${count}</span>`, iconSize:[size, size]});
+  }
+
+  function popup(c){
+    const a = document.createElement('a');
+    a.href = `/photos/${c.photo_id}?context=all`;
+    const img = document.createElement('img');
+    img.src = c.thumb; img.className = 'map-popup-img';
+    a.appendChild(img);
+    const wrap = document.createElement('div');
+    wrap.appendChild(a);
+    if(c.count > 1){
+      const more = document.createElement('div');
+      more.className = 'text-muted'; more.textContent = `${c.count} photos here — zoom in`;
+      wrap.appendChild(more);
+    }
+    return wrap;
+  }
+
+  async function refresh(){
+    const id = ++seq;
+    const params = new URLSearchParams({bbox: map.getBounds().toBBoxString(), zoom: map.getZoom()});
+    if(albumId) params.set('album_id', albumId);
+    try{
+      const res = await fetch(`${api}?${params}`);
+      if(!res.ok) throw new Error('Failed');
+      const data = await res.json();
+      if(id !== seq) return;  // a newer view was requested meanwhile
+      layer.clearLayers();
+      data.clusters.forEach(c => {
+        const m = L.marker([c.lat, c.lon], {icon: icon(c.count)}).bindPopup(() => popup(c));
+        if(c.count > 1) m.on('dblclick', () => map.setView([c.lat, c.lon], map.getZoom() + 2));
+        layer.addLayer(m);
+      });
+      if(status) status.textContent = `${data.total} photos in view`;
+    }catch(e){
+      if(status) status.textContent = 'Could not load photo locations.';
+    }
+  }
+
+  map.on('moveend', refresh);
+  refresh();
+})();
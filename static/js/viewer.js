@@ -69,6 +69,22 @@
   });
 })();
 
+/* --- Prefetch neighbouring previews --- */
+(function(){
+  const viewer = document.querySelector('.viewer');
+  if(!viewer) return;
+  const pid = viewer.dataset.photoId, context = viewer.dataset.context || 'all', w = viewer.dataset.previewWidth;
+  window.addEventListener('load', async ()=>{
+    try{
+      const res = await fetch(`/api/photos/${pid}/neighbours?n=3&context=${encodeURIComponent(context)}`);
+      if(!res.ok) return;
+      const data = await res.json();
+      // Next photos first: forward is the common direction
+      for(const id of [...data.next, ...data.prev.slice(0, 1)]){ const img = new Image(); img.src = `/photo/thumb/${id}?w=${w}`; }
+    }catch(e){ console.error(e); }
+  });
+})();
+
 /* --- Zoom / Pan --- */
 (function(){
   const img = document.querySelector('.viewer-img');
@@ -0,0 +1,104 @@
+import json, threading, traceback, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, Task
+from scanner import ScanProgress, ScanCancelled
+
+ACTIVE_STATES = ('pending', 'running')
+
+def album_key(album_id):
+    # Scans are keyed by album, not folder: same-named folders share an album, and a renamed album keeps its id
+    return f'album:{album_id}'
+
+class TaskManager:
+    # Background scans persisted in the tasks table. Live progress of running tasks is kept in memory
+    # (ScanProgress) and only written to the row when the task finishes.
+    def __init__(self, app, workers=2, keep_finished=100, retention_hours=24):
+        self.app = app; self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+        self.keep_finished = keep_finished; self.retention = timedelta(hours=retention_hours)
+        self.lock = threading.Lock(); self.live = {}
+
+    def recover(self):
+        # Tasks that were queued or running when the server stopped can't be resumed in-process
+        stale = Task.query.filter(Task.state.in_(ACTIVE_STATES)).all()
+        for t in stale: t.state = 'error'; t.message = 'Interrupted by server restart'; t.finished_at = datetime.utcnow()
+        db.session.commit(); self.evict()
+
+    def active_for(self, key):
+        with self.lock:
+            return next((tid for tid, (k, _) in self.live.items() if k == key), None)
+
+    def _register(self, key, path, kind):
+        # Every scan path registers here, so at most one scan per key runs at a time
+        with self.lock:
+            existing = next((tid for tid, (k, _) in self.live.items() if k == key), None)
+            if existing: return existing, None
+            task_id = str(uuid.uuid4()); progress = ScanProgress(); self.live[task_id] = (key, progress)
+        db.session.add(Task(id=task_id, kind=kind, key=key, path=str(path), state='pending')); db.session.commit()
+        return task_id, progress
+
+    def submit(self, key, path, runner, kind='scan'):
+        # runner(path, progress) -> (album, stats) runs inside an app context on a worker thread
+        task_id, progress = self._register(key, path, kind)
+        if progress is None: return task_id, False
+        self.executor.submit(self._run, task_id, path, runner, progress)
+        self.evict()
+        return task_id, True
+
+    def run(self, key, path, runner, kind='sync'):
+        # Same as submit, but runs on the calling thread and returns once the task has finished
+        task_id, progress = self._register(key, path, kind)
+        if progress is None: return task_id, False
+        self._run(task_id, path, runner, progress)
+        self.evict()
+        return task_id, True
+
+    def _run(self, task_id, path, runner, progress):
+        with self.app.app_context():
+            task = db.session.get(Task, task_id)
+            try:
+                progress.check()
+                task.state = 'running'; task.started_at = datetime.utcnow(); db.session.commit()
+                self.app.logger.info(f'Task started id={task_id} path={path}')
+                album, stats = runner(path, progress)
+                task.state = 'done'; task.album_id = album.id; task.album_name = album.name; task.result = json.dumps(stats)
+                self.app.logger.info(f'Task done id={task_id} album_id={album.id} stats={stats}')
+            except ScanCancelled:
+                db.session.rollback(); task = db.session.get(Task, task_id)
+                task.state = 'cancelled'; task.message = 'Cancelled'
+                self.app.logger.info(f'Task cancelled id={task_id}')
+            except Exception as e:
+                self.app.logger.error(f'Task failed id={task_id}', exc_info=True)
+                db.session.rollback(); task = db.session.get(Task, task_id)
+                task.state = 'error'; task.message = str(e); task.trace = traceback.format_exc()
+            finally:
+                task.progress = json.dumps(progress.snapshot()); task.finished_at = datetime.utcnow()
+                db.session.commit()
+                with self.lock: self.live.pop(task_id, None)
+
+    def cancel(self, task_id):
+        with self.lock: entry = self.live.get(task_id)
+        if entry is None: return False
+        entry[1].cancel_event.set(); return True
+
+    def status(self, task):
+        info = {'task_id': task.id, 'kind': task.kind, 'state': task.state, 'path': task.path,
+                'created_at': task.created_at.isoformat() if task.created_at else None,
+                'started_at': task.started_at.isoformat() if task.started_at else None,
+                'finished_at': task.finished_at.isoformat() if task.finished_at else None}
+        with self.lock: entry = self.live.get(task.id)
+        if entry is not None: info['progress'] = entry[1].snapshot()
+        elif task.progress: info['progress'] = json.loads(task.progress)
+        if task.album_id is not None: info.update(album_id=task.album_id, album_name=task.album_name)
+        if task.result: info.update(json.loads(task.result))
+        if task.message: info['message'] = task.message
+        if task.trace: info['trace'] = task.trace
+        return info
+
+    def evict(self):
+        finished = Task.query.filter(Task.state.notin_(ACTIVE_STATES))
+        cutoff = datetime.utcnow() - self.retention
+        old = [t.id for t in finished.order_by(Task.created_at.desc()).offset(self.keep_finished).with_entities(Task.id)]
+        Task.query.filter(Task.id.in_(old) | ((Task.finished_at < cutoff) & Task.state.notin_(ACTIVE_STATES))).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,51 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from models import db, Album, Photo
+from query_audit import audit_query_plans, hot_queries, recorded_statements
+
+@pytest.fixture
+def app(tmp_path):
+    # A seeded temporary database: root files (no day label) and photos without a date exercise the NULL blocks
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "plans.db"}', SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for n in range(3):
+            album = Album(name=f'Album {n}', path=f'/photos/{n}'); db.session.add(album); db.session.flush()
+            start = datetime(2024, 5, 1)
+            for i in range(60):
+                day = None if i < 10 else f'2024-05-{i % 5 + 1:02d}'
+                created = None if i % 7 == 0 else start + timedelta(hours=i)
+                db.session.add(Photo(album_id=album.id, file_path=f'/photos/{n}/{i}.jpg', filename=f'{i}.jpg', day_label=day,
+                                     created_at=created, user_title=str(i)))
+        db.session.commit()
+        yield app
+
+def test_hot_queries_use_their_indexes(app):
+    with app.app_context():
+        assert audit_query_plans() == {}
+
+def test_null_block_branches_are_audited(app):
+    with app.app_context():
+        sent = {}
+        for name, run, _, _ in hot_queries():
+            with recorded_statements(db.engine) as statements: run()
+            sent[name] = [s for s, _ in statements]
+        assert any('created_at IS NULL' in s for s in sent['next_ids_null_block'])
+        assert any('created_at IS NULL' in s for s in sent['prev_ids'])
+        assert any('day_label IS NULL' in s for s in sent['album_page_first'])
+        assert any('day_label IS NOT NULL' in s for s in sent['album_page_first'])
+
+def test_audit_reports_a_missing_index(app):
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ix_photos_album_day_created')); db.session.commit()
+        problems = audit_query_plans()
+        assert 'album_page_first' in problems and 'day_page' in problems
+        assert 'next_ids' not in problems
@@ -0,0 +1,77 @@
+import os, threading, time, uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+class ThumbnailCache:
+    # Derivatives live in <root>/<id % 256>/<id>_<mtime>_<width>.jpg so an edited source gets a new key;
+    # an in-memory LRU (seeded from file mtimes) keeps the whole cache under max_bytes.
+    TOUCH_INTERVAL = 24 * 3600
+
+    def __init__(self, root, sizes, max_bytes, quality=82):
+        self.root = Path(root); self.sizes = sorted(sizes); self.max_bytes = max_bytes; self.quality = quality
+        self.lock = threading.Lock(); self.entries = None; self.total = 0
+
+    def snap_width(self, w):
+        try: w = int(w)
+        except (TypeError, ValueError): return self.sizes[0]
+        return next((s for s in self.sizes if s >= w), self.sizes[-1])
+
+    def path_for(self, photo_id, mtime, width):
+        return self.root / f'{photo_id % 256:02x}' / f'{photo_id}_{int(mtime or 0)}_{width}.jpg'
+
+    def _load_index(self):
+        if self.entries is not None: return
+        found = []
+        if self.root.exists():
+            for p in self.root.glob('*/*.jpg'):
+                try: st = p.stat(); found.append((st.st_mtime, str(p), st.st_size))
+                except OSError: continue
+        self.entries = OrderedDict((path, [size, mtime]) for mtime, path, size in sorted(found))
+        self.total = sum(e[0] for e in self.entries.values())
+
+    def _hit(self, key):
+        entry = self.entries.get(key)
+        if entry is None: return False
+        self.entries.move_to_end(key); now = time.time()
+        if now - entry[1] > self.TOUCH_INTERVAL:
+            try: os.utime(key); entry[1] = now
+            except OSError: pass
+        return True
+
+    def _add(self, key, size):
+        self.entries[key] = [size, time.time()]; self.total += size
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            old, (old_size, _) = self.entries.popitem(last=False); self.total -= old_size
+            try: os.remove(old)
+            except OSError: pass
+
+    def get(self, photo_id, src_path, mtime, width):
+        out = self.path_for(photo_id, mtime, width); key = str(out)
+        with self.lock:
+            self._load_index()
+            if self._hit(key) and out.exists(): return out
+            stale = self.entries.pop(key, None)  # indexed but deleted on disk (or by another process sharing the cache)
+            if stale: self.total -= stale[0]
+        self._render(src_path, out, width)
+        with self.lock:
+            if key not in self.entries: self._add(key, out.stat().st_size)
+        return out
+
+    def _render(self, src_path, out, width):
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f'.{uuid.uuid4().hex}.tmp')
+        with Image.open(src_path) as img:
+            img.draft('RGB', (width, width))  # JPEG DCT scaling: decode at reduced size
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'L'): img = img.convert('RGB')
+            img.thumbnail((width, width), Image.LANCZOS)
+            img.save(tmp, 'JPEG', quality=self.quality, optimize=True)
+        os.replace(tmp, out)
+
+    def warm(self, items, widths):
+        for photo_id, src_path, mtime in items:
+            for w in widths:
+                try: self.get(photo_id, src_path, mtime, w)
+                except Exception: continue
@@ -0,0 +1,195 @@
+import ctypes, ctypes.util, os, select, struct, threading, time
+from pathlib import Path
+
+from models import db, Album
+from scanner import _list_dir
+from tasks import album_key
+
+# Keeps albums in sync with their folders. Change notifications are reduced to the folders that
+# changed (recursively for folders that appeared, vanished or moved); once an album has been quiet for
+# `debounce` seconds (or busy for `max_delay`), one incremental sync of just those folders runs as a
+# background task, which only reads new/changed files and refreshes the derived data they touch
+# (caches, map cells, search index, thumbnails). A queue overflow falls back to syncing the album. Idle cost: inotify sleeps in select(); the
+# poller stats each album directory once per interval, never the photos themselves.
+
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x4000, 0x8000, 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT = struct.Struct('iIII')
+OVERFLOW = object()
+
+def walk_dirs(root):
+    found, pending = [], [root]
+    while pending:
+        d = pending.pop(); found.append(d); pending.extend(_list_dir(d, ())[1])
+    return found
+
+def _under(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+class InotifySource:
+    def __init__(self, allowed_extensions):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.add_watch, self.rm_watch = libc.inotify_add_watch, libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0: raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.allowed = allowed_extensions; self.dirs = {}  # wd -> path
+        self.wake_r, self.wake_w = os.pipe(); os.set_blocking(self.wake_r, False)
+
+    def wake(self):
+        os.write(self.wake_w, b'x')
+
+    def watch(self, path):
+        wd = self.add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0: err = ctypes.get_errno(); raise OSError(err, os.strerror(err), path)
+        self.dirs[wd] = path
+
+    def unwatch(self, root):
+        for wd, path in list(self.dirs.items()):
+            if _under(path, root): self.rm_watch(self.fd, wd); self.dirs.pop(wd, None)
+
+    def wait(self, timeout):
+        ready = select.select([self.fd, self.wake_r], [], [], timeout)[0]
+        if self.wake_r in ready:
+            try: os.read(self.wake_r, 4096)
+            except BlockingIOError: pass
+        if self.fd not in ready: return set()
+        try: data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError: return set()
+        changed, i = set(), 0
+        while i + EVENT.size <= len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, i)
+            name = os.fsdecode(data[i + EVENT.size:i + EVENT.size + length].rstrip(b'\0')); i += EVENT.size + length
+            if mask & IN_Q_OVERFLOW: changed.add(OVERFLOW); continue
+            d = self.dirs.get(wd)
+            if d is None: continue
+            if mask & IN_IGNORED: self.dirs.pop(wd, None); continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for sub in walk_dirs(os.path.join(d, name)):
+                        try: self.watch(sub)
+                        except OSError: pass
+                changed.add((os.path.join(d, name), True))
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changed.add((d, True))
+            elif os.path.splitext(name)[1] in self.allowed:
+                if not mask & IN_CREATE: changed.add((d, False))  # wait for IN_CLOSE_WRITE: the file may still be copying
+        return changed
+
+class PollingSource:
+    # Directory mtimes change when entries are added, removed or renamed (which includes the usual
+    # save-to-temp-then-rename of editors); files rewritten in place are picked up by the next rescan.
+    def __init__(self, interval):
+        self.interval = interval; self.woken = threading.Event(); self.dirs = {}; self.next_poll = time.monotonic() + interval
+
+    def wake(self):
+        self.woken.set()
+
+    def watch(self, path):
+        try: self.dirs[path] = os.stat(path).st_mtime_ns
+        except OSError: pass
+
+    def unwatch(self, root):
+        for path in [p for p in self.dirs if _under(p, root)]: self.dirs.pop(path, None)
+
+    def wait(self, timeout):
+        if self.woken.wait(max(0, min(timeout, self.next_poll - time.monotonic()))): self.woken.clear(); return set()
+        if time.monotonic() < self.next_poll: return set()
+        self.next_poll = time.monotonic() + self.interval; changed = set()
+        for path, mtime in list(self.dirs.items()):
+            try: now = os.stat(path).st_mtime_ns
+            except OSError: self.dirs.pop(path, None); changed.add((path, True)); continue
+            if now == mtime: continue
+            self.dirs[path] = now; changed.add((path, False))
+            for sub in _list_dir(path, ())[1]:
+                if sub not in self.dirs:
+                    for d in walk_dirs(sub): self.watch(d)
+                    changed.add((sub, True))
+        return changed
+
+class AlbumWatcher:
+    def __init__(self, app, runner, mode='auto', debounce=2.0, max_delay=30.0, poll_interval=10.0, reconcile_interval=300.0):
+        self.app = app; self.runner = runner; self.mode = mode
+        self.debounce = debounce; self.max_delay = max_delay; self.poll_interval = poll_interval; self.reconcile_interval = reconcile_interval
+        self.stop_event = threading.Event(); self.refresh_event = threading.Event()
+        self.lock = threading.Lock(); self.thread = None; self.source = None; self.roots = {}
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None: return
+            self.source = self._make_source()
+            self.thread = threading.Thread(target=self._loop, name='album-watcher', daemon=True); self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.source is not None: self.source.wake()
+        if self.thread is not None: self.thread.join(timeout=10)
+
+    def refresh(self):
+        # Album added, moved or removed: re-read the watch list now
+        self.refresh_event.set()
+        if self.source is not None: self.source.wake()
+
+    def _make_source(self):
+        if self.mode in ('auto', 'inotify'):
+            try:
+                source = InotifySource(self.app.config['ALLOWED_EXTENSIONS'])
+                self.app.logger.info('Album watcher using inotify'); return source
+            except (OSError, AttributeError) as e:
+                if self.mode == 'inotify': raise
+                self.app.logger.info(f'inotify unavailable ({e}), album watcher polling every {self.poll_interval}s')
+        return PollingSource(self.poll_interval)
+
+    def _reconcile(self):
+        self.refresh_event.clear()
+        with self.app.app_context():
+            albums = {a.id: a.path for a in db.session.query(Album.id, Album.path).filter(Album.archived == False).all()}
+        for album_id, root in list(self.roots.items()):
+            if albums.get(album_id) != root: self.source.unwatch(root); self.roots.pop(album_id)
+        for album_id, root in albums.items():
+            if album_id in self.roots or not os.path.isdir(root): continue
+            self.roots[album_id] = root; failed = 0
+            for d in walk_dirs(root):
+                try: self.source.watch(d)
+                except OSError: failed += 1
+            if failed: self.app.logger.warning(f'Watch: {failed} folders of album id={album_id} not watched (raise fs.inotify.max_user_watches or set WATCH_MODE=poll)')
+
+    def _album_for(self, path):
+        return next((album_id for album_id, root in self.roots.items() if _under(path, root)), None)
+
+    def _sync(self, album_id, dirs):
+        # False when a scan of this album is already running: it may have walked past the change, so retry after it
+        root = self.roots.get(album_id)
+        if root is None: return True
+        if not os.path.isdir(root):
+            self.app.logger.warning(f'Watch: album folder missing, not syncing id={album_id} path={root}'); return True
+        with self.app.app_context():
+            album = db.session.get(Album, album_id)
+            if album is None or album.archived: return True
+            task_id, created = self.app.task_manager.submit(album_key(album_id), Path(album.path), lambda path, progress: self.runner(album_id, progress, dirs), kind='watch')
+        if created: self.app.logger.info(f'Watch: syncing album id={album_id} task={task_id}')
+        return created
+
+    def _loop(self):
+        pending = {}  # album_id -> (first event, last event, changed (folder, recursive) pairs or None for the whole album)
+        next_reconcile = 0
+        while not self.stop_event.is_set():
+            try:
+                now = time.monotonic()
+                if self.refresh_event.is_set() or now >= next_reconcile: self._reconcile(); next_reconcile = now + self.reconcile_interval
+                due = [min(last + self.debounce, first + self.max_delay) for first, last, _ in pending.values()]
+                changed = self.source.wait(max(0.05, min(due + [next_reconcile]) - now))
+                now = time.monotonic()
+                for change in changed:
+                    for album_id in (list(self.roots) if change is OVERFLOW else [self._album_for(change[0])]):
+                        if album_id is None: continue
+                        first, _, dirs = pending.get(album_id, (now, now, set()))
+                        if dirs is not None and change is not OVERFLOW: dirs.add(change)
+                        pending[album_id] = (first, now, None if change is OVERFLOW else dirs)
+                for album_id, (first, last, dirs) in list(pending.items()):
+                    if now - last >= self.debounce or now - first >= self.max_delay:
+                        if self._sync(album_id, dirs): pending.pop(album_id)
+                        else: pending[album_id] = (now, now, dirs)
+            except Exception:
+                self.app.logger.error('Album watcher error', exc_info=True); self.stop_event.wait(self.poll_interval)